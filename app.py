@@ -6,9 +6,9 @@ use_dotenv = False
 dotenv_path = "../../apis/.env"
 import env_options
 import lmsys_dataset_wrapper as lmsys
+from vote_store import VoteStore
+import pandas as pd
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, JsCode
-import json
-import os
 from datetime import datetime
 
 ##### DGR DEBUG #########
@@ -23,12 +23,25 @@ st.write("Browse 1 million chatbot conversations from lmsys/lmsys-chat-1m. Filte
          Upvote/downvote chats, and contribute to crowdsourcing a dataset with the best LLM prompts.")
 st.write("---")
 
-# Initialize session state for dataset only if not already loaded
+# Index, manifest, caches and sample pool are created once per process and shared by all sessions
+@st.cache_resource
+def load_shared_wrapper(hf_token):
+    return lmsys.DatasetWrapper(hf_token, request_timeout=10, lazy_conversations=True, cache_size=0)
+
+# Votes from every session go to one append-only store, written in batches off the request path
+@st.cache_resource
+def load_vote_store():
+    return VoteStore(db_path="db/votes.sqlite", legacy_json_path="json/votes_log.json")
+
+vote_store = load_vote_store()
+
+# Initialize session state for dataset only if not already loaded. Each session only keeps a cursor
+# (its result set and selected conversation) over the shared wrapper
 if "wrapper" not in st.session_state:
     hf_token, hf_token_write, openai_api_key = env_options.check_env(use_dotenv=use_dotenv, dotenv_path=dotenv_path)
 
     with st.spinner('Loading...'):
-        st.session_state.wrapper = lmsys.DatasetWrapper(hf_token, request_timeout=10)
+        st.session_state.wrapper = load_shared_wrapper(hf_token).cursor(cache_size=50)
         # st.session_state.initial_sample = st.session_state.wrapper.extract_sample_conversations(50)
 
     st.session_state.page_number = 1  # Initialize page state
@@ -43,30 +56,15 @@ page_number = st.session_state.page_number
 
 # Pagination setup
 page_size = 5
-total_pages = (len(wrapper.active_df) + page_size - 1) // page_size
-
-start_idx = (page_number - 1) * page_size
-end_idx = start_idx + page_size
+total_pages = max(1, (wrapper.active_table.num_rows + page_size - 1) // page_size)
 
-# st.dataframe(wrapper.active_df.iloc[start_idx:end_idx])
-
-# Replace the st.dataframe call with st.data_editor to enable row selection
-df_display = wrapper.active_df.iloc[start_idx:end_idx].copy()
-
-# Extract the first message content from each conversation as preview
-df_display["Prompt preview"] = df_display.apply(
-    lambda row: row.conversation[0].get("content", "")[:100] + "..." 
-    if len(row.conversation) > 0 else "No content", 
-    axis=1
-)
-df_display["Response preview"] = df_display.apply(
-    lambda row: row.conversation[1].get("content", "")[:100] + "..." 
-    if len(row.conversation) > 0 else "No content", 
-    axis=1
-)
-
-df_display = df_display[["conversation_id", "Prompt preview", "Response preview", "model", "language", "turn", "conversation"]]
-df_display = df_display.rename(columns={"turn": "n_turns"})
+# Display columns (previews, prompt length) are computed once per result set by the wrapper, and the
+# result set stays an Arrow table: a rerun slices the current page and converts only that page to pandas.
+# Missing messages have null previews
+df_display = wrapper.page(page_number, page_size, columns=[
+    "conversation_id", "prompt_preview", "response_preview", "model", "language", "turn", "prompt_length"
+]).to_pandas().rename(columns={"prompt_preview": "Prompt preview", "response_preview": "Response preview", "turn": "n_turns"})
+df_display[["Prompt preview", "Response preview"]] = df_display[["Prompt preview", "Response preview"]].fillna("No content")
 
 # Define handlers for pagination - critical for fixing double-click issue
 def go_to_next_page():
@@ -169,13 +167,13 @@ with search_col5:
 # Configure and display the AgGrid
 gb = GridOptionsBuilder.from_dataframe(df_display)
 gb.configure_selection(selection_mode='single', use_checkbox=True, pre_selected_rows=[0])  # First row selected by default
-gb.configure_column("conversation", hide=True)  # Hide the conversation object column
 gb.configure_column("Prompt preview", header_name="Prompt preview")
 gb.configure_column("Response preview", header_name="Response preview")
 gb.configure_column("conversation_id", header_name="Conversation ID")
 gb.configure_column("model", header_name="Model")
 gb.configure_column("language", header_name="Language")
 gb.configure_column("n_turns", header_name="Number of turns")
+gb.configure_column("prompt_length", header_name="Prompt length")
 gb.configure_grid_options(domLayout='normal')
 
 grid_options = gb.build()
@@ -186,7 +184,8 @@ grid_options['columnDefs'] = [
     {'field': 'Response preview', 'width': 300}, 
     {'field': 'model', 'width': 70},
     {'field': 'language', 'width': 55},
-    {'field': 'n_turns', 'width': 45}
+    {'field': 'n_turns', 'width': 45},
+    {'field': 'prompt_length', 'width': 55}
 ]
 
 grid_response = AgGrid(
@@ -205,7 +204,11 @@ selected_rows = grid_response["selected_rows"]
 if (selected_rows is None or len(selected_rows) == 0) and len(df_display) > 0:
     selected_rows = df_display.iloc[[0]]  # Force selection of the first row
 
-st.write(f"{len(wrapper.active_df)} conversations loaded")
+st.write(f"{wrapper.active_table.num_rows} conversations loaded")
+if wrapper.active_table.num_rows == 0:
+    st.info("No results found")
+if wrapper.index_status not in ("ready", "not needed"):
+    st.info(wrapper.index_status_message())
 col1, col2 = st.columns([2.4, 8])
 
 with col1:
@@ -234,8 +237,9 @@ if len(selected_rows) > 0:
     try:
         selected_row = selected_rows[0] if isinstance(selected_rows, list) else selected_rows.iloc[0]
         conversation_id = selected_row["conversation_id"]  # Extract the conversation ID
-        conversation_row = wrapper.active_df.loc[wrapper.active_df["conversation_id"] == conversation_id].iloc[0]
-        st.session_state.wrapper.active_conversation = lmsys.Conversation(conversation_row)
+        # Fetches the full conversation on selection (cached by the wrapper)
+        if wrapper.get_conversation(conversation_id) is None:
+            raise KeyError(conversation_id)
         st.write("---")
 
         col1, col2 = st.columns([2, 1])
@@ -258,6 +262,8 @@ if len(selected_rows) > 0:
                        f"**Language:** {lang_print}  \n"
                        f"**Turns:** {turns_print}  \n"
                        f"**Redacted:** {redacted_print}")
+            score = vote_store.conversation_score(id_print)
+            st.markdown(f"**Votes:** 👍 {score['upvotes']} · 👎 {score['downvotes']}")
 
             # additional elements
             st.write("---")
@@ -275,34 +281,25 @@ if len(selected_rows) > 0:
             # Handle voting
             if upvote or downvote:
                 
-                # Create votes directory if it doesn't exist
-                os.makedirs("json", exist_ok=True)
-                votes_file = "json/votes_log.json"
-                
-                # Prepare the vote data
-                vote_data = {
-                    "conversation_id": id_print,
-                    "model": model_print,
-                    "vote": "upvote" if upvote else "downvote",
-                    "timestamp": datetime.now().isoformat(),
-                }
-                
-                # Load existing votes or create new file
-                try:
-                    with open(votes_file, "r") as f:
-                        votes_log = json.load(f)
-                except (FileNotFoundError, json.JSONDecodeError):
-                    votes_log = {"votes": []}
-                
-                # Add new vote and save
-                votes_log["votes"].append(vote_data)
-                with open(votes_file, "w") as f:
-                    json.dump(votes_log, f, indent=2)
+                # Queued and written in the background by the shared vote store
+                vote_store.record(conversation_id=id_print, model=model_print,
+                                  vote="upvote" if upvote else "downvote",
+                                  timestamp=datetime.now().isoformat())
                 
                 # Show confirmation message
                 vote_type = "upvoted" if upvote else "downvoted"
                 st.success(f"You {vote_type} this conversation. Thank you for your contribution!")
 
+        # Leaderboard, read from the vote aggregates maintained by the vote store
+        with st.expander("🏆 Best prompts leaderboard"):
+            board_col1, board_col2 = st.columns([2, 1])
+            with board_col1:
+                st.markdown("**Top conversations**")
+                st.dataframe(pd.DataFrame(vote_store.top_conversations(limit=20)), hide_index=True)
+            with board_col2:
+                st.markdown("**Models**")
+                st.dataframe(pd.DataFrame(vote_store.model_leaderboard()), hide_index=True)
+
         # Footer
         st.write("---")
         st.markdown(
@@ -0,0 +1,113 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from lmsys_dataset_wrapper import DatasetWrapper
+
+
+class AsyncDatasetWrapper:
+    def __init__(self, wrapper, max_concurrency=8):
+        """
+        asyncio front end to a DatasetWrapper, so one event loop can serve many users.
+
+        Every operation runs the wrapper's blocking I/O in a dedicated thread pool of max_concurrency threads,
+        and an asyncio.Semaphore bounds how many operations are in flight; the others wait on the loop without
+        holding a thread. Methods return DataFrames (pyarrow Tables if the wrapper has arrow_results) and never change the wrapper's active result set, so calls
+        from different users do not interfere.
+
+        Cancellation is cooperative: cancelling a search, shard download or sample sets a stop event that the
+        worker threads check between shards and download chunks (and before drawing a sample), and the call
+        waits for the worker to stop before re-raising asyncio.CancelledError. ID lookups and manifest
+        refreshes are left to finish in the background.
+
+        Parameters:
+        - wrapper (DatasetWrapper): Wrapper holding the manifest, caches and indexes.
+        - max_concurrency (int): Maximum number of operations running at once.
+        """
+        self.wrapper = wrapper
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="async-wrapper")
+
+    @classmethod
+    async def create(cls, hf_token, max_concurrency=8, **kwargs):
+        """
+        Builds the underlying DatasetWrapper in a worker thread, so the event loop is not blocked while it
+        reads the manifest and the indexes. kwargs are passed to DatasetWrapper.
+        """
+        loop = asyncio.get_running_loop()
+        wrapper = await loop.run_in_executor(None, functools.partial(DatasetWrapper, hf_token, **kwargs))
+        return cls(wrapper, max_concurrency=max_concurrency)
+
+    async def _run(self, func, *args, stop_event=None, **kwargs):
+        async with self._semaphore:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if stop_event is not None:
+                    stop_event.set()
+                    # Hold the concurrency slot until the worker reaches its next checkpoint
+                    await asyncio.wait([future])
+                raise
+
+    def _output(self, result):
+        # Same columns as the synchronous API: the display columns are added (and, in lazy mode, the bodies
+        # dropped) by the wrapper's _materialize
+        return self.wrapper._output(self.wrapper._materialize(result)[0])
+
+    async def refresh_manifest(self):
+        """
+        Revalidates the shard manifest with conditional requests and applies it if it changed.
+
+        Returns:
+        - bool: True if the manifest changed.
+        """
+        wrapper = self.wrapper
+        changed = await self._run(wrapper.manifest.revalidate, session=wrapper.session, headers=wrapper.headers,
+                                  timeout=wrapper.timeout)
+        if changed:
+            wrapper._apply_manifest(wrapper.manifest)
+        return changed
+
+    async def download_shard(self, url):
+        """
+        Returns a local path to the shard at url, downloading it into the shard cache on a miss. None on failure.
+        """
+        stop_event = threading.Event()
+        return await self._run(self.wrapper._get_shard, url, stop_event, stop_event=stop_event)
+
+    async def literal_text_search(self, filter_str, min_results=1, role=None):
+        """
+        Returns conversations containing filter_str (case insensitive), like DatasetWrapper.literal_text_search,
+        as a DataFrame (empty if nothing is found). Results are shared with the wrapper's result cache.
+        role restricts the search to 'user' or 'assistant' messages.
+        """
+        if filter_str == "":
+            return await self.extract_sample_conversations(50)
+        stop_event = threading.Event()
+        report = {"scanned": [], "cancelled": [], "failed": []}
+        result = await self._run(self.wrapper._cached_literal_text_search, filter_str, min_results, stop_event, report,
+                                 role, stop_event=stop_event)
+        return self._output(result)
+
+    async def extract_conversations(self, conversation_ids):
+        """
+        Returns the conversations with the given IDs as a DataFrame.
+        """
+        return self._output(await self._run(self.wrapper._cached_extract_conversations, list(conversation_ids)))
+
+    async def extract_sample_conversations(self, n_samples, seed=None):
+        """
+        Returns n_samples random conversations as a DataFrame: from the sample pool when unseeded,
+        drawn uniformly across shards otherwise (see DatasetWrapper.extract_sample_conversations).
+        """
+        stop_event = threading.Event()
+        return self._output(await self._run(self.wrapper._take_sample, n_samples, seed, stop_event,
+                                            stop_event=stop_event))
+
+    def close(self):
+        """
+        Shuts down the worker threads. Operations still running finish in the background.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,204 @@
+import os
+import json
+import shutil
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Hex digit value of each byte, 255 for bytes that are not hex digits
+_NIBBLES = np.full(256, 255, dtype=np.uint8)
+_NIBBLES[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+_NIBBLES[np.frombuffer(b"abcdef", dtype=np.uint8)] = np.arange(10, 16)
+_NIBBLES[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+class ConversationIndex:
+    def __init__(self, index_dir):
+        """
+        Memory-mapped lookup table from conversation ID to shard, row group and row offset.
+
+        The index is a directory of .npy arrays: sorted 16-byte conversation UUIDs plus parallel arrays
+        with the shard number, row group and row offset within the row group. The arrays are opened with
+        mmap, so loading takes milliseconds and the pages are shared by every process using the index.
+        Lookups are binary searches over the sorted UUIDs.
+
+        Parameters:
+        - index_dir (str): Directory written by ConversationIndex.build.
+        """
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "shards.json"), "r", encoding="utf-8") as f:
+            shards = json.load(f)
+        self.shards = shards["shards"]
+        # ETag of the indexed version of each shard (None for indexes written before ETags were recorded)
+        self.etags = shards.get("etags") or [None] * len(self.shards)
+        self.ids = np.load(os.path.join(index_dir, "ids.npy"), mmap_mode="r")
+        self.shard = np.load(os.path.join(index_dir, "shard.npy"), mmap_mode="r")
+        self.row_group = np.load(os.path.join(index_dir, "row_group.npy"), mmap_mode="r")
+        self.row = np.load(os.path.join(index_dir, "row.npy"), mmap_mode="r")
+        if not (len(self.ids) == len(self.shard) == len(self.row_group) == len(self.row)):
+            raise ValueError(f"Inconsistent conversation index at {index_dir}")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, conversation_id):
+        return self.lookup(conversation_id) is not None
+
+    def __getitem__(self, conversation_id):
+        """
+        Returns the shard file name holding a conversation, like the former JSON index did.
+        """
+        location = self.lookup(conversation_id)
+        if location is None:
+            raise KeyError(conversation_id)
+        return location[0]
+
+    def shard_entries(self, file_name):
+        """
+        Returns the entries of one indexed shard as (ids, row_group, row) arrays, e.g. to carry them over
+        to a rebuilt index without reading the shard again.
+        """
+        mask = np.asarray(self.shard) == self.shards.index(file_name)
+        return np.asarray(self.ids)[mask], np.asarray(self.row_group)[mask], np.asarray(self.row)[mask]
+
+    @staticmethod
+    def _encode(conversation_ids):
+        """
+        Converts 32-character hex conversation IDs to an array of 16-byte keys.
+        Returns the keys and a boolean mask of the IDs that could be encoded.
+        """
+        keys = np.zeros(len(conversation_ids), dtype="S16")
+        valid = np.zeros(len(conversation_ids), dtype=bool)
+        for i, conversation_id in enumerate(conversation_ids):
+            try:
+                key = bytes.fromhex(conversation_id)
+            except (ValueError, TypeError):
+                continue
+            if len(key) == 16:
+                keys[i] = key
+                valid[i] = True
+        return keys, valid
+
+    def lookup_many(self, conversation_ids):
+        """
+        Looks up several conversation IDs at once.
+
+        Returns:
+        - list: One (file_name, row_group, row) tuple per ID, or None for IDs not in the index.
+        """
+        keys, valid = self._encode(conversation_ids)
+        positions = np.searchsorted(self.ids, keys)
+        results = []
+        for key, is_valid, position in zip(keys, valid, positions):
+            if not is_valid or position >= len(self.ids) or self.ids[position] != key:
+                results.append(None)
+                continue
+            results.append((self.shards[int(self.shard[position])],
+                            int(self.row_group[position]), int(self.row[position])))
+        return results
+
+    def lookup(self, conversation_id):
+        """
+        Returns (file_name, row_group, row) for a conversation ID, or None if it is not indexed.
+        """
+        return self.lookup_many([conversation_id])[0]
+
+    @staticmethod
+    def hex_to_keys(hex_ids):
+        """
+        Converts a pyarrow string array of 32-character hex IDs to 16-byte keys, without per-row Python work.
+        The raw string buffer is viewed as an (n, 32) byte matrix and decoded with a nibble lookup table.
+
+        Returns:
+        - numpy.ndarray: 'S16' keys, one per ID.
+        """
+        if hex_ids.null_count > 0 or pc.any(pc.not_equal(pc.utf8_length(hex_ids), 32)).as_py():
+            raise ValueError("Unexpected conversation ID format")
+        if len(hex_ids) == 0:
+            return np.zeros(0, dtype="S16")
+        offset_type = np.int64 if pa.types.is_large_string(hex_ids.type) else np.int32
+        offsets = np.frombuffer(hex_ids.buffers()[1], dtype=offset_type)[hex_ids.offset:hex_ids.offset + len(hex_ids) + 1]
+        chars = np.frombuffer(hex_ids.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]].reshape(-1, 32)
+        nibbles = _NIBBLES[chars]
+        if (nibbles == 255).any():
+            raise ValueError("Unexpected conversation ID format")
+        return np.ascontiguousarray((nibbles[:, 0::2] << 4) | nibbles[:, 1::2]).view("S16").ravel()
+
+    @staticmethod
+    def keys_to_hex(keys):
+        """
+        Converts a pyarrow fixed_size_binary(16) array of keys back to 32-character lowercase hex IDs,
+        the inverse of hex_to_keys.
+
+        Returns:
+        - pyarrow.StringArray: One hex ID per key.
+        """
+        data = np.frombuffer(keys.buffers()[1], dtype=np.uint8)[keys.offset * 16:(keys.offset + len(keys)) * 16]
+        data = data.reshape(-1, 16)
+        chars = np.empty((len(keys), 32), dtype=np.uint8)
+        chars[:, 0::2] = _HEX_DIGITS[data >> 4]
+        chars[:, 1::2] = _HEX_DIGITS[data & 15]
+        offsets = np.arange(0, 32 * len(keys) + 1, 32, dtype=np.int32)
+        return pa.StringArray.from_buffers(len(keys), pa.py_buffer(offsets), pa.py_buffer(chars))
+
+    @staticmethod
+    def read_shard_ids(parquet_path, id_column="conversation_id"):
+        """
+        Reads the conversation IDs of a local parquet shard as 16-byte keys, with the row group
+        and row offset of each one. Only the ID column is read.
+
+        Returns:
+        - tuple: (ids, row_group, row) numpy arrays.
+        """
+        parquet_file = pq.ParquetFile(parquet_path)
+        ids, row_groups, rows = [], [], []
+        for i in range(parquet_file.num_row_groups):
+            column = parquet_file.read_row_group(i, columns=[id_column]).column(id_column)
+            for chunk in column.chunks:
+                ids.append(ConversationIndex.hex_to_keys(chunk))
+            num_rows = len(column)
+            row_groups.append(np.full(num_rows, i, dtype=np.uint32))
+            rows.append(np.arange(num_rows, dtype=np.uint32))
+        if not ids:
+            return np.zeros(0, dtype="S16"), np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint32)
+        return np.concatenate(ids), np.concatenate(row_groups), np.concatenate(rows)
+
+    @classmethod
+    def build(cls, index_dir, shard_ids, etags=None):
+        """
+        Writes a new index to index_dir, replacing any previous one.
+
+        Parameters:
+        - index_dir (str): Output directory.
+        - shard_ids (list): (file_name, ids, row_group, row) tuples, as returned by read_shard_ids plus the shard file name.
+        - etags (list): ETag of each indexed shard, in the order of shard_ids.
+
+        Returns:
+        - ConversationIndex: The new index.
+        """
+        if not shard_ids:
+            raise ValueError("Refusing to build a conversation index without shards")
+        if os.path.isfile(index_dir):
+            raise ValueError(f"Refusing to replace the file {index_dir} with a conversation index directory")
+        shards = [file_name for file_name, _, _, _ in shard_ids]
+        ids = np.concatenate([ids for _, ids, _, _ in shard_ids])
+        shard = np.concatenate([np.full(len(ids), i, dtype=np.uint16) for i, (_, ids, _, _) in enumerate(shard_ids)])
+        row_group = np.concatenate([rg for _, _, rg, _ in shard_ids])
+        row = np.concatenate([r for _, _, _, r in shard_ids])
+
+        order = np.argsort(ids, kind="stable")
+        tmp_dir = f"{index_dir.rstrip(os.sep)}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        np.save(os.path.join(tmp_dir, "ids.npy"), ids[order])
+        np.save(os.path.join(tmp_dir, "shard.npy"), shard[order])
+        np.save(os.path.join(tmp_dir, "row_group.npy"), row_group[order])
+        np.save(os.path.join(tmp_dir, "row.npy"), row[order])
+        with open(os.path.join(tmp_dir, "shards.json"), "w", encoding="utf-8") as f:
+            json.dump({"shards": shards, "etags": etags or [None] * len(shards)}, f, indent=2)
+
+        shutil.rmtree(index_dir, ignore_errors=True)
+        os.replace(tmp_dir, index_dir)
+        return cls(index_dir)
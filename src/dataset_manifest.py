@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import requests
+from remote_parquet import open_remote_parquet
+
+
+class DatasetManifest:
+    def __init__(self, dataset_name, path="cache/manifest.json",
+                 list_url="https://datasets-server.huggingface.co/parquet?dataset={dataset_name}"):
+        """
+        Persisted description of the dataset's parquet shards: URLs, sizes, ETags, row counts and row group layout.
+
+        The manifest is read from disk at startup, so the wrapper can start without any network round trip.
+        revalidate() (or revalidate_in_background()) refreshes it with conditional requests: the shard list
+        is fetched with If-None-Match, each shard is checked with a HEAD request, and parquet footers are only
+        range-read for shards that are new or changed. Failures leave the cached copy in place.
+
+        Parameters:
+        - dataset_name (str): Hugging Face dataset name.
+        - path (str): JSON file where the manifest is persisted.
+        - list_url (str): Datasets-server endpoint listing the parquet files. {dataset_name} is substituted.
+        """
+        self.dataset_name = dataset_name
+        self.path = path
+        self.list_url = list_url.format(dataset_name=dataset_name)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.data = {"dataset_name": dataset_name, "list_etag": None, "revision": None, "fetched_at": None, "shards": []}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("dataset_name") == dataset_name:
+                self.data = data
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    @property
+    def shards(self):
+        return self.data["shards"]
+
+    @property
+    def urls(self):
+        return [shard["url"] for shard in self.shards]
+
+    @property
+    def revision(self):
+        return self.data["revision"]
+
+    def is_loaded(self):
+        return len(self.shards) > 0
+
+    def shard(self, url):
+        """
+        Returns the manifest entry of the shard at url, or None.
+        """
+        for shard in self.shards:
+            if shard["url"] == url:
+                return shard
+        return None
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(self.path)}.", suffix=".tmp",
+                                        dir=os.path.dirname(self.path) or ".")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def revalidate(self, session=None, headers=None, timeout=20, read_footers=True):
+        """
+        Refreshes the manifest from the network with conditional requests and saves it if anything changed.
+
+        Parameters:
+        - session (requests.Session): Session used for the requests.
+        - headers (dict): Request headers, e.g. authorization.
+        - timeout (int): Timeout in seconds for each request.
+        - read_footers (bool): Range-read the footers of new or changed shards to record row counts and row groups.
+
+        Returns:
+        - bool: True if the manifest changed.
+        """
+        session = session or requests
+        headers = dict(headers or {})
+        data = json.loads(json.dumps(self.data))
+        list_headers = dict(headers)
+        if data["list_etag"] and data["shards"]:
+            list_headers["If-None-Match"] = data["list_etag"]
+        response = session.get(self.list_url, headers=list_headers, timeout=timeout)
+        changed = False
+        if response.status_code == 200:
+            previous = {shard["url"]: shard for shard in data["shards"]}
+            data["shards"] = [previous.get(file["url"], {"url": file["url"], "file_name": file["url"].split("/")[-1],
+                                                         "size": file.get("size"), "etag": None,
+                                                         "num_rows": None, "row_groups": None})
+                              for file in response.json()["parquet_files"]]
+            data["list_etag"] = response.headers.get("ETag")
+            changed = list(previous) != [shard["url"] for shard in data["shards"]]
+        elif response.status_code != 304:
+            raise ValueError(f"Failed to retrieve {self.list_url}. Status code: {response.status_code}")
+
+        for shard in data["shards"]:
+            head_response = session.head(shard["url"], allow_redirects=True, headers=headers, timeout=timeout)
+            if head_response.status_code != 200:
+                continue
+            etag = head_response.headers.get("X-Linked-Etag") or head_response.headers.get("ETag") or ""
+            if etag != shard["etag"]:
+                shard.update({"etag": etag, "size": int(head_response.headers.get("Content-Length", 0)) or shard["size"],
+                              "num_rows": None, "row_groups": None})
+                changed = True
+            if read_footers and shard["row_groups"] is None:
+                parquet_file, _ = open_remote_parquet(shard["url"], headers=headers, timeout=timeout,
+                                                      size=shard["size"], session=session)
+                metadata = parquet_file.metadata
+                shard["num_rows"] = metadata.num_rows
+                shard["row_groups"] = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+                changed = True
+
+        data["fetched_at"] = time.time()
+        data["revision"] = hashlib.sha1(
+            json.dumps([(shard["url"], shard["etag"]) for shard in data["shards"]]).encode("utf-8")
+        ).hexdigest()[:16]
+        with self._lock:
+            self.data = data
+            self.save()
+        return changed
+
+    def revalidate_in_background(self, on_update=None, **kwargs):
+        """
+        Runs revalidate() in a daemon thread. on_update(manifest) is called if the manifest changed.
+        Errors are printed and the cached manifest is kept.
+        """
+        def run():
+            try:
+                if self.revalidate(**kwargs) and on_update is not None:
+                    on_update(self)
+            except (requests.exceptions.RequestException, ValueError, OSError) as e:
+                print(f"Manifest revalidation failed, using cached copy: {e}")
+
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._thread = threading.Thread(target=run, name="manifest-revalidation", daemon=True)
+        self._thread.start()
+        return self._thread
@@ -0,0 +1,193 @@
+import os
+import threading
+import duckdb
+
+
+class DuckDBStore:
+    def __init__(self, db_path="db/lmsys.duckdb", verbose=True):
+        """
+        Persistent DuckDB database holding the whole dataset, for indexed search, ID lookup and sampling.
+
+        Tables:
+        - conversations: one row per conversation with the typed columns of the parquet shards.
+        - messages: flattened messages (message_id, conversation_id, position, role, content).
+        - shards: shards already ingested, with the ETag of the ingested version.
+
+        A full-text-search index over messages.content is built with DuckDB's fts extension when it is
+        available. Literal searches use it to narrow down candidate messages and then verify the exact
+        substring, so results match a plain scan.
+
+        Parameters:
+        - db_path (str): Path of the .duckdb file. An existing file is reused as is.
+        - verbose (bool): Print ingestion progress.
+        """
+        self.db_path = db_path
+        self.verbose = verbose
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.con = duckdb.connect(db_path)
+        self._lock = threading.Lock()
+        self.con.execute("CREATE TABLE IF NOT EXISTS shards (file_name VARCHAR PRIMARY KEY, etag VARCHAR, num_rows BIGINT)")
+        self.con.execute("CREATE SEQUENCE IF NOT EXISTS message_id_seq")
+        self.fts = self._load_fts()
+
+    def _load_fts(self):
+        try:
+            self.con.execute("LOAD fts")
+            return True
+        except duckdb.Error:
+            pass
+        try:
+            self.con.execute("INSTALL fts")
+            self.con.execute("LOAD fts")
+        except duckdb.Error as e:
+            print(f"DuckDB fts extension not available, searches will scan the messages table: {e}")
+            return False
+        return True
+
+    def _cursor(self):
+        # Cursors are cheap per-thread connections to the same database
+        return self.con.cursor()
+
+    def _query(self, sql, params=None):
+        # Metadata queries run on their own cursor, since any thread may call them
+        cursor = self._cursor()
+        try:
+            return cursor.execute(sql, params or []).fetchall()
+        finally:
+            cursor.close()
+
+    def _has_table(self, name):
+        return self._query("SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [name])[0][0] > 0
+
+    def ingested_shards(self):
+        """
+        Returns a dict mapping ingested shard file names to their ETags.
+        """
+        return dict(self._query("SELECT file_name, etag FROM shards"))
+
+    def is_ready(self):
+        """
+        True if at least one shard has been ingested.
+        """
+        return self._has_table("conversations") and len(self.ingested_shards()) > 0
+
+    def has_fts_index(self):
+        return self.fts and self._query(
+            "SELECT count(*) FROM duckdb_schemas() WHERE schema_name = 'fts_main_messages'"
+        )[0][0] > 0
+
+    def ingest_shard(self, file_name, parquet_path, etag=None):
+        """
+        Loads one local parquet shard into the conversations and messages tables, replacing a previous
+        ingestion of the same shard. Call build_fts_index once all shards are in.
+        """
+        with self._lock:
+            if not self._has_table("conversations"):
+                self.con.execute(f"""
+                    CREATE TABLE conversations AS
+                    SELECT *, ''::VARCHAR AS shard FROM read_parquet('{parquet_path}') LIMIT 0
+                """)
+                self.con.execute("""
+                    CREATE TABLE messages (message_id BIGINT, conversation_id VARCHAR, position INTEGER,
+                                           role VARCHAR, content VARCHAR)
+                """)
+            self.con.execute("BEGIN TRANSACTION")
+            try:
+                self.con.execute("""
+                    DELETE FROM messages WHERE conversation_id IN
+                    (SELECT conversation_id FROM conversations WHERE shard = ?)
+                """, [file_name])
+                self.con.execute("DELETE FROM conversations WHERE shard = ?", [file_name])
+                self.con.execute(f"""
+                    INSERT INTO conversations
+                    SELECT *, ? AS shard FROM read_parquet('{parquet_path}')
+                """, [file_name])
+                self.con.execute(f"""
+                    INSERT INTO messages
+                    SELECT nextval('message_id_seq'), conversation_id, position, message.role, message.content
+                    FROM (
+                        SELECT conversation_id,
+                               unnest(conversation) AS message,
+                               generate_subscripts(conversation, 1) AS position
+                        FROM read_parquet('{parquet_path}')
+                    )
+                """)
+                num_rows = self.con.execute("SELECT count(*) FROM conversations WHERE shard = ?", [file_name]).fetchone()[0]
+                self.con.execute("INSERT OR REPLACE INTO shards VALUES (?, ?, ?)", [file_name, etag, num_rows])
+                self.con.execute("COMMIT")
+            except Exception:
+                self.con.execute("ROLLBACK")
+                raise
+        if self.verbose:
+            print(f"Ingested {num_rows} conversations from {file_name}")
+
+    def build_fts_index(self):
+        """
+        (Re)builds the conversation ID index and, if the fts extension is available, the full-text index on messages.
+        """
+        with self._lock:
+            self.con.execute("CREATE INDEX IF NOT EXISTS conversations_id_idx ON conversations (conversation_id)")
+            if self.fts:
+                self.con.execute("PRAGMA create_fts_index('messages', 'message_id', 'content', overwrite = 1)")
+            self.con.execute("CHECKPOINT")
+
+    def search(self, filter_str, min_results=1, limit=None, role=None):
+        """
+        Returns up to `limit` conversations with a message containing filter_str (case insensitive) as a pyarrow Table.
+        The full-text index, when present, narrows the messages to check. If it yields fewer than min_results
+        conversations (the index works on stemmed words and skips stopwords), the messages are scanned instead.
+        With role ('user' or 'assistant'), only messages with that role are matched.
+        """
+        cursor = self._cursor()
+        limit_clause = f"LIMIT {int(limit)}" if limit else ""
+        role_clause, role_params = ("AND role = ?", [role]) if role is not None else ("", [])
+        try:
+            if self.has_fts_index():
+                table = cursor.execute(f"""
+                    SELECT c.* EXCLUDE (shard) FROM conversations c
+                    WHERE c.conversation_id IN (
+                        SELECT conversation_id FROM messages
+                        WHERE fts_main_messages.match_bm25(message_id, ?, conjunctive := 1) IS NOT NULL
+                          AND contains(lower(content), lower(?)) {role_clause}
+                    )
+                    {limit_clause}
+                """, [filter_str, filter_str] + role_params).to_arrow_table()
+                if table.num_rows >= min_results:
+                    return table
+            return cursor.execute(f"""
+                SELECT c.* EXCLUDE (shard) FROM conversations c
+                WHERE c.conversation_id IN (
+                    SELECT conversation_id FROM messages WHERE contains(lower(content), lower(?)) {role_clause}
+                )
+                {limit_clause}
+            """, [filter_str] + role_params).to_arrow_table()
+        finally:
+            cursor.close()
+
+    def get_conversations(self, conversation_ids):
+        """
+        Returns the conversations with the given IDs as a pyarrow Table.
+        """
+        cursor = self._cursor()
+        try:
+            return cursor.execute("""
+                SELECT * EXCLUDE (shard) FROM conversations WHERE conversation_id IN (SELECT unnest(?::VARCHAR[]))
+            """, [list(conversation_ids)]).to_arrow_table()
+        finally:
+            cursor.close()
+
+    def sample(self, n_samples, seed=None):
+        """
+        Returns n_samples conversations drawn uniformly from the whole database as a pyarrow Table.
+        """
+        cursor = self._cursor()
+        repeatable = f" REPEATABLE ({int(seed)})" if seed is not None else ""
+        try:
+            return cursor.execute(f"""
+                SELECT * EXCLUDE (shard) FROM conversations USING SAMPLE reservoir({int(n_samples)} ROWS){repeatable}
+            """).to_arrow_table()
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.con.close()
@@ -0,0 +1,39 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def make_session(max_connections_per_host=8, max_retries=3, backoff_factor=0.5):
+    """
+    Creates a pooled requests session with keep-alive, bounded retries and exponential backoff.
+
+    Connections are reused across requests, so repeated calls to the same host skip the TCP and TLS
+    handshakes. GET and HEAD requests are retried on connection errors, read timeouts, 429 and 5xx
+    responses, waiting backoff_factor * 2 ** (attempt - 1) seconds between attempts (honoring Retry-After).
+    Each host keeps up to max_connections_per_host idle connections for reuse; requests beyond that open
+    a connection that is closed after use instead of waiting for a free one.
+
+    Parameters:
+    - max_connections_per_host (int): Number of connections kept for reuse for each host.
+    - max_retries (int): Maximum number of retries per request. 0 disables retries.
+    - backoff_factor (float): Base delay in seconds for the exponential backoff.
+
+    Returns:
+    - requests.Session: The configured session. It is safe to share between threads.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_maxsize=max_connections_per_host, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -1,77 +1,434 @@
 import os
+import time
+import shutil
 import pandas as pd
+import numpy as np
 import textwrap
 import random
-import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import requests
-import json
-import tempfile
 from datasets import load_dataset
 from collections import defaultdict
+from collections.abc import Mapping, Sequence
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http_session import make_session
+from dataset_manifest import DatasetManifest
+from shard_cache import ShardCache
+from remote_parquet import open_remote_parquet, read_conversations, read_rows
+from conversation_index import ConversationIndex
+from trigram_index import TrigramIndex
+from duckdb_store import DuckDBStore
+from result_cache import ResultCache
+from sample_pool import SamplePool
+from warm_cache import WarmCache
+from result_schema import compact_results, empty_result, find_conversation, memory_report, to_pandas, with_hex_ids
+from search_columns import (SEARCH_TEXT_VERSION, SearchColumnStore, listing_table, message_text, normalize_query,
+                            search_column, search_rows, with_display_columns)
 
-class DatasetWrapper:
+
+def concat_results(tables):
+    """
+    Concatenates query results (pyarrow Tables) without copying their buffers. Tables whose schemas differ
+    slightly (e.g. a null column) are unified. Returns the empty result set (see result_schema.empty_result)
+    if no table has rows.
+    """
+    tables = [table for table in tables if table.num_rows > 0]
+    if not tables:
+        return empty_result()
+    if len(tables) == 1:
+        return tables[0]
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+class _ActiveResultSet:
+    """
+    Active result set shared by DatasetWrapper and DatasetCursor. The result set is kept as a pyarrow
+    Table in the compact result schema (active_table, see result_schema); active_df converts it to pandas
+    on first access only. Queries go through self.wrapper, the DatasetWrapper that owns the shared
+    resources (the wrapper itself, or the wrapper of a cursor).
+    """
+
+    def literal_text_search(self, filter_str, min_results=1, role=None):
+        """
+        Searches all shards for conversations containing filter_str (case insensitive).
+
+        Shards are downloaded and scanned in parallel by up to `search_workers` threads. As soon as
+        min_results conversations are found, pending shards are cancelled. The shards that were actually
+        scanned are recorded in `self.search_report`.
+
+        Parameters:
+        - filter_str (str): Text to search for. An empty string returns a random sample instead.
+        - min_results (int): Number of conversations after which the search stops.
+        - role (str): Only match messages with this role ('user' or 'assistant'). All messages if None.
+        """
+        # If filter_str is empty, sample random conversations
+        if filter_str == "":
+            return self.extract_sample_conversations(50)
+        self.search_report = {"scanned": [], "cancelled": [], "failed": []}
+        return self._finish_search(self.wrapper._cached_literal_text_search(filter_str, min_results,
+                                                                            report=self.search_report, role=role))
+
+    def _finish_search(self, result):
+        """
+        Makes a search result the active result set. If nothing was found, the active result set is the
+        empty result (see result_schema.empty_result) and there is no active conversation.
+        """
+        if result.num_rows == 0:
+            print("No results found")
+        return self._set_active_df(result)
+
+    def extract_sample_conversations(self, n_samples, seed=None):
+        """
+        Returns n_samples random conversations. Unseeded samples are served from the pre-warmed sample pool,
+        topped up with a fresh draw if the pool is short. Seeded samples are always drawn with _draw_sample.
+        """
+        result = self.wrapper._take_sample(n_samples, seed=seed)
+        if result.num_rows == 0:
+            return self._output(self.active_table, active=True)
+        return self._set_active_df(result)
+
+    def extract_conversations(self, conversation_ids):
+        return self._set_active_df(self.wrapper._cached_extract_conversations(conversation_ids))
+
+    def get_conversation(self, conversation_id):
+        """
+        Returns a conversation of the active result set as a Conversation and makes it the active conversation.
+        In lazy mode the body is read from the conversation cache, or fetched by ID and cached.
+
+        Parameters:
+        - conversation_id (str): ID of the conversation.
+
+        Returns:
+        - Conversation: The conversation, or None if it could not be retrieved.
+        """
+        conversation = self.wrapper._lookup_conversation(conversation_id, self.active_table,
+                                                         current=self.active_conversation)
+        if conversation is not None:
+            self.active_conversation = conversation
+        return conversation
+
+    def _set_active_df(self, result):
+        """
+        Makes a query result the active result set and its first row the active conversation.
+        Returns the result set as a DataFrame, or as a pyarrow Table with arrow_results.
+        """
+        table, conversation = self.wrapper._materialize(result)
+        self._set_active_table(table)
+        if conversation is not None or table.num_rows == 0:
+            self.active_conversation = conversation
+        return self._output(table, active=True)
+
+    def _output(self, table, active=False):
+        # Results stay Arrow inside the wrapper; pandas is only produced here, at the edge
+        if self.wrapper.arrow_results:
+            return table
+        return self.active_df if active else to_pandas(table)
+
+    def _set_active_table(self, table):
+        self.active_table = table
+        self._active_df = None
+
+    @property
+    def active_df(self):
+        if self._active_df is None:
+            self._active_df = to_pandas(self.active_table)
+        return self._active_df
+
+    @active_df.setter
+    def active_df(self, df):
+        self.active_table = compact_results(pa.Table.from_pandas(df, preserve_index=False))
+        self._active_df = df
+
+    def page(self, page_number, page_size, columns=None):
+        """
+        Returns one page of the active result set as a pyarrow Table. The page is a zero-copy slice of
+        active_table, so paginating does not copy or convert the rest of the result set. Only the
+        conversation IDs of the page are converted, to hex strings.
+
+        Parameters:
+        - page_number (int): Page number, starting at 1.
+        - page_size (int): Number of rows per page.
+        - columns (list): Columns to keep. All columns by default.
+
+        Returns:
+        - pyarrow.Table: The rows of the page (empty past the last page).
+        """
+        table = self.active_table.slice((page_number - 1) * page_size, page_size)
+        if columns is not None:
+            table = table.select([column for column in columns if column in table.column_names])
+        return with_hex_ids(table)
+
+    def memory_report(self):
+        """
+        Reports the memory held by the active result set and by the caches shared through the wrapper.
+
+        Returns:
+        - dict: Bytes held by each part. 'active_table' details the active result set per column
+          (see result_schema.memory_report); 'active_df' is only present once the pandas view was built.
+        """
+        report = {"active_table": memory_report(self.active_table)}
+        if self._active_df is not None:
+            report["active_df"] = int(self._active_df.memory_usage(deep=True).sum())
+        report["result_cache"] = self.result_cache.size()
+        report["conversation_cache"] = self.conversation_cache.size()
+        report["sample_pool"] = self.sample_pool.size() if self.sample_pool is not None else 0
+        return report
+
+
+class DatasetWrapper(_ActiveResultSet):
     def __init__(self, hf_token, dataset_name="lmsys/lmsys-chat-1m", verbose=True, 
-                 conversations_index="json/conversations_index.json", cache_size=50, request_timeout=20):
+                 conversations_index="index/conversations", cache_size=50, request_timeout=20,
+                 shard_cache_dir="cache/shards", shard_cache_bytes=8 * 1024**3, range_reads=False,
+                 search_workers=4, download_chunk_size=1024 * 1024, progress_callback=None,
+                 max_retries=3, backoff_factor=0.5, max_connections_per_host=8, trigram_index="index/trigrams",
+                 database=None, database_search_limit=1000,
+                 result_cache_bytes=256 * 1024**2, result_cache_ttl=3600, result_cache_dir=None, result_cache_disk_bytes=1024**3,
+                 search_column_dir="cache/search", materialize_search_columns=True, search_role_columns=False,
+                 manifest_path="cache/manifest.json", revalidate_manifest=True, manifest_list_url=None,
+                 sample_pool_path="cache/sample_pool.parquet", sample_pool_size=250, sample_pool_low_water=50,
+                 lazy_conversations=False, conversation_cache_bytes=64 * 1024**2, arrow_results=False,
+                 warm_cache_path="cache/warm_chats.parquet", sample_rows_per_row_group=25):
         self.hf_token = hf_token
         self.dataset_name = dataset_name
         self.headers = {"Authorization": f"Bearer {self.hf_token}"}
         self.timeout = request_timeout
         self.cache_size = cache_size
         self.verbose = verbose
-        parquet_list_url = f"https://datasets-server.huggingface.co/parquet?dataset={self.dataset_name}"
-        response = self._safe_get(parquet_list_url)
-        # Extract URLs from the response JSON
-        if response is not None:
-            self.parquet_urls = [file['url'] for file in response.json()['parquet_files']]
-            if self.verbose:
-                print("\nParquet URLs:")
-                for url in self.parquet_urls:
-                    print(url)
-                    head_response = self._safe_head(url)
-                    file_size = int(head_response.headers['Content-Length'])
-                    print(f"{url.split('/')[-1]}: {file_size} bytes")
-
-        # Loading the index
+        # One pooled session with keep-alive, retries and backoff for every request the wrapper makes
+        self.max_retries = max_retries
+        self.session = make_session(max_connections_per_host=max_connections_per_host,
+                                    max_retries=max_retries, backoff_factor=backoff_factor)
+        # Local shard cache shared by sampling, ID extraction, search and indexing
+        self.shard_cache = ShardCache(cache_dir=shard_cache_dir, max_bytes=shard_cache_bytes)
+        self._etags = {}
+        # Range-read mode: ID lookups fetch only the row groups they need from shards that are not cached
+        self.range_reads = range_reads
+        self._remote_footers = {}
+        # Number of shards downloaded and scanned at once by literal_text_search
+        self.search_workers = search_workers
+        self.search_report = {"scanned": [], "cancelled": [], "failed": []}
+        # Cache of search and ID lookup results (LRU + TTL, optionally persisted as parquet)
+        self.result_cache = ResultCache(max_bytes=result_cache_bytes, ttl=result_cache_ttl,
+                                        persist_dir=result_cache_dir, max_disk_bytes=result_cache_disk_bytes,
+                                        verbose=verbose)
+        # Precomputed, lowercased message text per shard; searches scan it instead of the conversation structs
+        self.search_columns = SearchColumnStore(search_column_dir, role_columns=search_role_columns)
+        # Lazy mode: the active result set holds metadata and previews only, conversation bodies are fetched on selection
+        self.lazy_conversations = lazy_conversations
+        self.conversation_cache = ResultCache(max_bytes=conversation_cache_bytes, ttl=None, verbose=False)
+        # Result sets are pyarrow Tables internally; arrow_results=True also returns them as Tables instead of DataFrames
+        self.arrow_results = arrow_results
+        self.materialize_search_columns = materialize_search_columns
+        # Optional trigram index (built offline with create_trigram_index) to narrow literal searches
+        self.trigram_index = TrigramIndex(trigram_index) if trigram_index else None
+        # Shard downloads are streamed to disk in chunks; progress_callback(file_name, bytes_done, bytes_total)
+        self.download_chunk_size = download_chunk_size
+        self.progress_callback = progress_callback
+        # Shard manifest: read from disk so startup makes no network round trips, then revalidated
+        # in the background with conditional requests. Only the very first run waits for the network.
+        if manifest_list_url:
+            self.manifest = DatasetManifest(self.dataset_name, path=manifest_path, list_url=manifest_list_url)
+        else:
+            self.manifest = DatasetManifest(self.dataset_name, path=manifest_path)
+        if not self.manifest.is_loaded() and self.timeout != 0:
+            try:
+                self.manifest.revalidate(session=self.session, headers=self.headers, timeout=self.timeout,
+                                         read_footers=False)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Failed to retrieve the parquet file list: {e}")
+        self._apply_manifest(self.manifest)
+        if revalidate_manifest and self.timeout != 0:
+            self.manifest.revalidate_in_background(on_update=self._apply_manifest, session=self.session,
+                                                   headers=self.headers, timeout=self.timeout)
+        if self.verbose:
+            print("\nParquet URLs:")
+            for shard in self.manifest.shards:
+                print(shard["url"])
+                print(f"{shard['file_name']}: {shard['size']} bytes")
+
+        # Optional local DuckDB database: search, ID lookup and sampling become indexed queries against it.
+        # An existing database file is reused; otherwise all shards are ingested once.
+        self.database = None
+        self.database_search_limit = database_search_limit
+        if database:
+            self.database = DuckDBStore(database, verbose=verbose)
+            if not self.database.is_ready():
+                self.create_database()
+
+        # Loading the index (memory-mapped, so this is cheap and shared across processes)
+        if os.path.isfile(conversations_index):
+            # Older versions stored the index as a JSON file mapping IDs to shards. It has no row group
+            # positions, so a new index is built in a directory next to it instead
+            legacy_index = conversations_index
+            conversations_index = os.path.splitext(legacy_index)[0]
+            if conversations_index == legacy_index:
+                conversations_index = f"{legacy_index}.index"
+            print(f"{legacy_index} is a legacy JSON index. Using the conversation index at {conversations_index}.")
+        self.conversations_index_path = conversations_index
+        self.index_progress = (0, len(self.parquet_urls))
+        self._index_thread = None
+        self._index_lock = threading.Lock()
         try:
-            with open(conversations_index, "r", encoding="utf-8") as f:
-                self.conversations_index = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            print(f"Conversations index file not found or invalid. Creating a new one at {conversations_index}.")
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(conversations_index), exist_ok=True)
-            self.create_conversations_index(output_index_file=conversations_index)
-            with open(conversations_index, "r", encoding="utf-8") as f:
-                self.conversations_index = json.load(f)
-
-        # Initialize active conversation and DataFrame        
-        # Read from "pkl/cached_chats.pkl" if available:
+            self.conversations_index = ConversationIndex(conversations_index)
+        except (OSError, ValueError) as e:
+            self.conversations_index = None
+            if self.database is not None:
+                # ID lookups go to the database, so the index is not needed
+                print(f"Conversations index not available ({e}). Using the database for ID lookups.")
+            else:
+                print(f"Conversations index not found or invalid ({e}).")
+        self._check_index()
+
+        # Random samples take at most this many rows from each row group they read, so a sample of n rows
+        # reads about n / sample_rows_per_row_group row groups. Lower values spread samples over more of the
+        # dataset; higher values read fewer bytes per sample
+        self.sample_rows_per_row_group = sample_rows_per_row_group
+        # Sessions start from a sample of the warm cache (refreshed with refresh_warm_cache)
+        self.warm_cache = WarmCache(warm_cache_path) if warm_cache_path else None
+        # Pre-sampled conversations served by extract_sample_conversations, refilled in the background
+        self.sample_pool = None
+        if sample_pool_size > 0:
+            self.sample_pool = SamplePool(self._draw_sample, path=sample_pool_path, pool_size=sample_pool_size,
+                                          low_water=sample_pool_low_water, verbose=verbose)
+        self._load_cached_chats()
+        if self.sample_pool is not None and self.timeout != 0:
+            self.sample_pool.start()
+
+    def _check_index(self):
+        """
+        Compares the conversation index with the manifest and sets index_status and index_shards (the shards
+        whose index entries can be used). A shard is usable if the index holds it and the indexed ETag matches
+        the manifest's (when both are known). If shards are missing or changed, the index is rebuilt in the
+        background; until then, IDs in those shards are looked up by scanning them.
+        """
+        if self.database is not None and self.conversations_index is None:
+            self.index_status, self.index_shards = "not needed", set()
+            return
+        index = self.conversations_index
+        urls = self.parquet_urls
+        if index is None:
+            self.index_shards = set()
+        elif not urls:
+            # No manifest to compare with yet (offline first start); checked again once it arrives
+            self.index_shards = set(index.shards)
+        else:
+            indexed_etags = dict(zip(index.shards, index.etags))
+            self.index_shards = set()
+            for url in urls:
+                file_name = url.split("/")[-1]
+                if file_name not in indexed_etags:
+                    continue
+                indexed_etag, etag = indexed_etags[file_name], self._etags.get(url)
+                if indexed_etag is None or etag is None or indexed_etag == etag:
+                    self.index_shards.add(file_name)
+        if index is not None and (not urls or len(self.index_shards) == len(urls)):
+            self.index_status = "ready"
+            return
+        with self._index_lock:
+            if self._index_thread is not None and self._index_thread.is_alive():
+                return
+            if not urls:
+                # Never build an index without shards
+                print("No shards listed yet. The conversation index will be built once the manifest is available.")
+                self.index_status = "pending"
+                return
+            print(f"Conversations index covers {len(self.index_shards)} of {len(urls)} shards. "
+                  f"Building it at {self.conversations_index_path} in the background.")
+            self.index_status = "building" if index is None else "partial"
+            self._index_thread = threading.Thread(target=self._build_index_in_background,
+                                                  args=(self.conversations_index_path,),
+                                                  name="conversations-index", daemon=True)
+            self._index_thread.start()
+
+    def _build_index_in_background(self, conversations_index):
         try:
-            self.active_df = pd.read_pickle("pkl/cached_chats.pkl")
-            print(f"Loaded {len(self.active_df)} cached chats")
-            self.active_df = self.active_df.sample(self.cache_size).reset_index(drop=True)
-        except (FileNotFoundError, ValueError):
-            self.active_df = pd.DataFrame()
-            print("No cached chats found")
-        if not self.active_df.empty:
+            # Ensure parent directory exists
+            os.makedirs(os.path.dirname(conversations_index) or ".", exist_ok=True)
+            index = self.create_conversations_index(output_index_dir=conversations_index)
+            self.conversations_index = index
+            self.index_shards = set(index.shards)
+            self.index_status = "ready" if len(index.shards) == len(self.parquet_urls) else "partial"
+        except Exception as e:
+            print(f"Error building conversations index: {e}")
+            self.index_status = "failed" if self.conversations_index is None else "partial"
+
+    def index_status_message(self):
+        """
+        Returns a short, user-facing description of the conversation index status.
+        """
+        if self.index_status == "building":
+            done, total = self.index_progress
+            return f"Building conversation index ({done}/{total} shards). ID lookups scan the dataset until it is ready."
+        if self.index_status == "partial":
+            return "Conversation index is incomplete. IDs in missing shards are looked up by scanning."
+        if self.index_status == "failed":
+            return "Conversation index could not be built. ID lookups scan the dataset."
+        if self.index_status == "pending":
+            return "Conversation index will be built once the shard list is available. ID lookups scan the dataset."
+        return f"Conversation index {self.index_status}."
+
+    def _apply_manifest(self, manifest):
+        """
+        Points the wrapper at the shards listed in the manifest. Also used as the background revalidation callback.
+        """
+        # Identifies the set of shards; cached results from another revision are never reused
+        self.dataset_revision = manifest.revision
+        self._etags.update({shard["url"]: shard["etag"] for shard in manifest.shards if shard["etag"] is not None})
+        self.parquet_urls = manifest.urls
+        if hasattr(self, "index_status"):
+            # The shard list or ETags may have changed since the index was built
+            self._check_index()
+
+    def _load_cached_chats(self):
+        # Initialize active conversation and result set from the warm cache
+        if self.warm_cache is not None and not self.warm_cache.exists() and os.path.exists("pkl/cached_chats.pkl"):
+            # One-off migration of the former pickled cache of sampled chats
             try:
-                self.active_conversation = Conversation(self.active_df.iloc[0])
-            except Exception as e:
-                print(f"No conversations available: {e}")
+                cached_df = pd.read_pickle("pkl/cached_chats.pkl").sample(frac=1)
+                self.warm_cache.write(pa.Table.from_pandas(cached_df, preserve_index=False))
+            except (ValueError, OSError, pa.ArrowException) as e:
+                print(f"Could not migrate pkl/cached_chats.pkl: {e}")
+        self.active_conversation = None
+        cached = self._initial_sample(self.cache_size)
+        # Empty results also go through _materialize, so the result set always has the display columns
+        self._set_active_df(cached)
+        if cached.num_rows > 0:
+            print(f"Loaded {cached.num_rows} cached chats")
         else:
-            self.active_conversation = None
+            print("No cached chats found")
+
+    def _initial_sample(self, n_samples):
+        # Only a few row groups of the warm cache are read
+        if n_samples <= 0:
+            return empty_result()
+        if self.warm_cache is not None and not self.warm_cache.exists() and self.sample_pool is not None:
+            # Until refresh_warm_cache is run, the warm cache is seeded from the pool without consuming it,
+            # so new sessions do not drain the pool
+            pooled = self.sample_pool.peek()
+            if pooled.num_rows > 0:
+                self.warm_cache.write(pooled)
+        cached = self.warm_cache.sample(n_samples) if self.warm_cache is not None else None
+        if cached is None and self.sample_pool is not None:
+            cached = self.sample_pool.take(n_samples)
+        return cached if cached is not None and cached.num_rows > 0 else empty_result()
 
-    def _safe_get(self, url):
+    def _safe_get(self, url, stream=False):
         if self.timeout == 0:
             print("Timeout is set to 0. Skipping GET request.")
             return None
         else:
             try:
-                response = requests.get(url, headers=self.headers, timeout=self.timeout)
+                response = self.session.get(url, headers=self.headers, timeout=self.timeout, stream=stream)
                 if response.status_code != 200:
+                    # Streamed responses hold their pooled connection until closed
+                    response.close()
                     raise ValueError(f"Failed to retrieve {url}. Status code: {response.status_code}")
                 return response
-            except requests.exceptions.Timeout:
-                print(f"Timeout occurred for GET {url}. Skipping.")
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                print(f"Timeout occurred for GET {url} after {self.max_retries} retries. Skipping.")
                 return None
             
     def _safe_head(self, url):
@@ -79,51 +436,343 @@ class DatasetWrapper:
             print("Timeout is set to 0. Skipping HEAD request.")
             return None
         try:
-            response = requests.head(url, allow_redirects=True, headers=self.headers, timeout=self.timeout)
+            response = self.session.head(url, allow_redirects=True, headers=self.headers, timeout=self.timeout)
             return response
-        except requests.exceptions.Timeout:
-            print(f"Timeout occurred for GET {url}. Skipping.")
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            print(f"Timeout occurred for HEAD {url} after {self.max_retries} retries. Skipping.")
             return None
 
-    def extract_sample_conversations(self, n_samples):
-        url = random.choice(self.parquet_urls)
-        print(f"Sampling conversations from {url}")
-        # Download file with auth headers using requests
-        r = self._safe_get(url)
+    def _shard_etag(self, url):
+        """
+        Returns the ETag of a shard, asking the origin once per wrapper. None if the origin is unreachable.
+        """
+        if url not in self._etags:
+            head_response = self._safe_head(url)
+            if head_response is None or head_response.status_code != 200:
+                return None
+            headers = head_response.headers
+            self._etags[url] = headers.get("X-Linked-Etag") or headers.get("ETag") or ""
+        return self._etags[url]
+
+    def _safe_download(self, url, path, stop_event=None):
+        """
+        Streams url to path in chunks of `download_chunk_size` bytes, so memory use stays bounded
+        whatever the file size. After each chunk, calls progress_callback(file_name, bytes_done, bytes_total)
+        if the wrapper has one. Returns False if the download failed, was truncated or was cancelled
+        through stop_event.
+        """
+        file_name = url.split("/")[-1]
+        r = self._safe_get(url, stream=True)
         if r is None:
-            print(f"Timeout occurred for GET {url}. Skipping sample extraction.")
-            return self.active_df
-        # Write the downloaded content into a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".parquet", delete=False) as tmp:
-            tmp.write(r.content)
-            # tmp.flush()
-            tmp_path = tmp.name
+            return False
+        total = int(r.headers.get("Content-Length", 0)) or None
+        done = 0
         try:
-            query_result = duckdb.query(f"SELECT * FROM read_parquet('{tmp_path}') USING SAMPLE {n_samples}").df()
-            self.active_df = query_result
-            try:
-                self.active_conversation = Conversation(query_result.iloc[0])
-            except Exception as e:
-                print(f"No conversations available: {e}")
+            with open(path, "wb") as f:
+                for chunk in r.iter_content(chunk_size=self.download_chunk_size):
+                    if stop_event is not None and stop_event.is_set():
+                        print(f"Download of {file_name} cancelled.")
+                        return False
+                    f.write(chunk)
+                    done += len(chunk)
+                    if self.progress_callback is not None:
+                        self.progress_callback(file_name, done, total)
+        except requests.exceptions.RequestException as e:
+            print(f"Download of {file_name} failed: {e}")
+            return False
+        finally:
+            r.close()
+        if total is not None and done != total:
+            print(f"Download of {file_name} truncated: {done} of {total} bytes.")
+            return False
+        return True
+
+    def _get_shard(self, url, stop_event=None):
+        """
+        Returns a local path to the shard at url, streaming it into the shard cache on a miss.
+        Falls back to any cached copy if the origin cannot be reached. Returns None if neither works.
+        """
+        file_name = url.split("/")[-1]
+        etag = self._shard_etag(url)
+        cached_path = self.shard_cache.get(file_name, etag)
+        if cached_path is not None:
+            return cached_path
+        if etag is None:
+            print(f"Could not validate {file_name} against the origin. Skipping.")
+            return None
+        tmp_path = self.shard_cache.reserve(file_name)
+        try:
+            if not self._safe_download(url, tmp_path, stop_event=stop_event):
+                return None
+            return self.shard_cache.put(file_name, etag, tmp_path)
         finally:
-            # Clean up the temporary file
             if os.path.exists(tmp_path):
                 os.unlink(tmp_path)
 
-        return query_result
+    def _open_remote_shard(self, url):
+        """
+        Opens a remote shard for range reads, reusing its footer if it was fetched before.
+
+        Returns:
+        - tuple: (pyarrow.parquet.ParquetFile, HTTPRangeFile)
+        """
+        metadata, size = self._remote_footers.get(url, (None, None))
+        parquet_file, range_file = open_remote_parquet(url, headers=self.headers, timeout=self.timeout,
+                                                       metadata=metadata, size=size, session=self.session)
+        self._remote_footers[url] = (parquet_file.metadata, range_file.size)
+        return parquet_file, range_file
 
-    def extract_conversations(self, conversation_ids):
+    def _open_shard(self, url, stop_event=None, range_reads=None):
+        """
+        Opens a shard as a pyarrow ParquetFile: from the shard cache if present, by range requests
+        in range-read mode, or by downloading it into the cache otherwise. Returns None on failure.
+        range_reads overrides the wrapper's range-read mode for this call.
+        """
+        file_name = url.split("/")[-1]
+        cached_path = self.shard_cache.get(file_name, self._shard_etag(url))
+        range_reads = self.range_reads if range_reads is None else range_reads
+        if range_reads and cached_path is None and self.timeout != 0:
+            return self._open_remote_shard(url)[0]
+        shard_path = cached_path or self._get_shard(url, stop_event=stop_event)
+        return pq.ParquetFile(shard_path) if shard_path is not None else None
+
+    def _read_remote_conversations(self, url, conversation_ids, row_groups=None):
+        """
+        Reads the given conversations from a remote shard with HTTP range requests.
+        The parquet footer is fetched once per shard and reused on later calls.
+        If row_groups is given, only those row groups are requested.
+        """
+        if self.timeout == 0:
+            print("Timeout is set to 0. Skipping range requests.")
+            return None
+        file_name = url.split("/")[-1]
+        try:
+            parquet_file, range_file = self._open_remote_shard(url)
+            table = read_conversations(parquet_file, conversation_ids, row_groups=row_groups)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            print(f"Timeout occurred for range requests to {url}. Skipping.")
+            return None
+        print(f"Fetched {range_file.bytes_fetched} bytes in {range_file.requests_made} range request(s) from {file_name}")
+        return table
+
+    def _materialize(self, result):
+        """
+        Prepares a query result (pyarrow Table) to become a result set: it is converted to the compact result
+        schema (see result_schema.compact_results) and the display columns (previews, prompt
+        length, number of messages; see search_columns.with_display_columns) are computed once here, so
+        displaying a page only slices them. In lazy mode, only the listing columns are kept (see
+        search_columns.listing_table) and the body of the first conversation goes to the conversation cache.
+
+        Returns:
+        - tuple: (result set as a pyarrow Table, Conversation of the first row or None)
+        """
+        table = pa.Table.from_pandas(result, preserve_index=False) if isinstance(result, pd.DataFrame) else result
+        table = compact_results(table)
+        conversation = None
+        if table.num_rows > 0:
+            conversation = Conversation(table, 0)
+            if self.lazy_conversations and "conversation" in table.column_names:
+                # Copy the row, so the cache does not keep the buffers of the whole result alive
+                first_row = pa.Table.from_pylist(table.slice(0, 1).to_pylist(), schema=table.schema)
+                self.conversation_cache.put(conversation.conversation_metadata["conversation_id"], first_row)
+        if "conversation" in table.column_names and "prompt_preview" not in table.column_names:
+            table = listing_table(table) if self.lazy_conversations else with_display_columns(table)
+        return table, conversation
+
+    def _lookup_conversation(self, conversation_id, active_table, current=None):
+        # Reruns of the app select the same conversation again; reuse it instead of building a new one
+        if current is not None and current.conversation_metadata.get("conversation_id") == conversation_id:
+            return current
+        if "conversation" in active_table.column_names:
+            rows = find_conversation(active_table, conversation_id)
+        else:
+            rows = self.conversation_cache.get(conversation_id)
+            if rows is None:
+                # Only the row group holding the conversation is read, never a whole shard
+                rows = self._extract_conversations([conversation_id], range_reads=True)
+                if rows.num_rows > 0:
+                    self.conversation_cache.put(conversation_id, rows)
+        if rows is None or rows.num_rows == 0:
+            print(f"Conversation {conversation_id} not found")
+            return None
+        return Conversation(rows, 0)
+
+    def _shard_row_groups(self, url):
+        """
+        Returns the row counts of a shard's row groups, from the manifest if recorded there, otherwise from
+        the parquet footer of the cached copy or, failing that, of the remote file (one range request).
+        """
+        shard = self.manifest.shard(url)
+        if shard is not None and shard.get("row_groups") is not None:
+            return shard["row_groups"]
+        cached_path = self.shard_cache.get(url.split("/")[-1], self._shard_etag(url))
+        metadata = pq.ParquetFile(cached_path).metadata if cached_path else self._open_remote_shard(url)[0].metadata
+        row_groups = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+        if shard is not None:
+            shard["num_rows"], shard["row_groups"] = metadata.num_rows, row_groups
+        return row_groups
+
+    def _sample_shard_rows(self, url, rows):
+        """
+        Reads the given rows (row numbers within the shard) of one shard, fetching only the row groups that
+        hold them: from the shard cache if present, by range requests otherwise.
+        """
+        file_name = url.split("/")[-1]
+        cached_path = self.shard_cache.get(file_name, self._shard_etag(url))
+        if cached_path is not None:
+            return read_rows(pq.ParquetFile(cached_path), rows)
+        parquet_file, range_file = self._open_remote_shard(url)
+        table = read_rows(parquet_file, rows)
+        print(f"Fetched {range_file.bytes_fetched} bytes in {range_file.requests_made} range request(s) from {file_name}")
+        return table
+
+    @property
+    def wrapper(self):
+        # The wrapper owns the resources that _ActiveResultSet queries go through
+        return self
+
+    def cursor(self, cache_size=None):
+        """
+        Returns a DatasetCursor: per-user result set state over this wrapper's shared resources.
+        """
+        return DatasetCursor(self, cache_size=self.cache_size if cache_size is None else cache_size)
+
+    def _take_sample(self, n_samples, seed=None, stop_event=None):
+        result = self.sample_pool.take(n_samples) if seed is None and self.sample_pool is not None else empty_result()
+        if result.num_rows < n_samples:
+            if stop_event is not None and stop_event.is_set():
+                return compact_results(concat_results([result]))
+            drawn = self._draw_sample(n_samples - result.num_rows, seed=seed)
+            if drawn is not None:
+                result = concat_results([result, drawn])
+        else:
+            print(f"Served {result.num_rows} conversations from the sample pool")
+        return compact_results(result)
+
+    def _draw_sample(self, n_samples, seed=None, urls=None):
+        """
+        Draws n_samples random conversations from the whole dataset, reading only the row groups it is drawn from.
+
+        About n_samples / sample_rows_per_row_group row groups are drawn without replacement with probability
+        proportional to their size, using the row group sizes recorded in the parquet footers, and the same
+        number of rows is then drawn uniformly within each of them. Large row groups are more likely to be
+        read but give each of their rows a smaller chance to be picked, so every conversation has about the
+        same chance to be in a sample. The spread of a sample grows with its size, and the cost of a draw is
+        the row groups it reads (from the shard cache or by HTTP range requests).
+
+        Parameters:
+        - n_samples (int): Number of conversations to draw.
+        - seed (int): Random seed. The same seed and dataset revision give the same sample.
+        - urls (list): Shards to draw from. All shards by default.
+
+        Returns:
+        - pyarrow.Table: The sampled conversations, in random order, or None if sampling failed.
+        """
+        if self.database is not None:
+            print(f"Sampling {n_samples} conversations from {self.database.db_path}")
+            return self.database.sample(n_samples, seed=seed)
+        if self.timeout == 0 and urls is None:
+            print("Timeout is set to 0. Skipping sample extraction.")
+            return None
+        urls = list(self.parquet_urls if urls is None else urls)
+        try:
+            row_groups = [self._shard_row_groups(url) for url in urls]
+        except (requests.exceptions.RequestException, ValueError, OSError) as e:
+            print(f"Could not read shard row counts: {e}. Skipping sample extraction.")
+            return None
+        # One entry per row group of the dataset: shard, first row within the shard, number of rows
+        group_shard = np.array([i for i, sizes in enumerate(row_groups) for _ in sizes], dtype=np.int64)
+        group_start = np.array([start for sizes in row_groups for start in np.cumsum([0] + list(sizes))[:-1]], dtype=np.int64)
+        group_rows = np.array([size for sizes in row_groups for size in sizes], dtype=np.int64)
+        if group_rows.sum() == 0:
+            return None
+        rng = np.random.default_rng(seed)
+        # Weighted sampling without replacement (Efraimidis-Spirakis keys), largest keys first
+        nonempty = np.flatnonzero(group_rows > 0)
+        order = nonempty[np.argsort(-rng.random(len(nonempty)) ** (1.0 / group_rows[nonempty]))]
+        enough = np.searchsorted(np.cumsum(group_rows[order]), n_samples) + 1
+        wanted = -(-n_samples // max(self.sample_rows_per_row_group, 1))
+        chosen = order[:max(wanted, enough)]
+        # Equal share of the sample per row group; rows that do not fit in small row groups go to the others
+        quota = np.zeros(len(chosen), dtype=np.int64)
+        remaining = min(n_samples, int(group_rows[chosen].sum()))
+        while remaining > 0:
+            room = group_rows[chosen] - quota
+            available = np.flatnonzero(room > 0)
+            share = np.minimum(room[available], -(-remaining // len(available)))
+            share = np.minimum(share, np.maximum(remaining - (np.cumsum(share) - share), 0))
+            quota[available] += share
+            remaining -= int(share.sum())
+        rows = np.concatenate([group_start[g] + np.sort(rng.choice(group_rows[g], size=q, replace=False))
+                               for g, q in zip(chosen, quota)])
+        row_shard = np.concatenate([np.full(q, group_shard[g]) for g, q in zip(chosen, quota)])
+        shards = np.unique(row_shard)
+        print(f"Sampling {len(rows)} conversations from {len(chosen)} row group(s) in {len(shards)} shard(s)")
+
+        tables = []
+        with ThreadPoolExecutor(max_workers=self.search_workers) as executor:
+            futures = {executor.submit(self._sample_shard_rows, urls[i], np.sort(rows[row_shard == i])): urls[i]
+                       for i in shards}
+            for future in as_completed(futures):
+                try:
+                    tables.append((futures[future], future.result()))
+                except (requests.exceptions.RequestException, ValueError, OSError) as e:
+                    print(f"Error sampling {futures[future].split('/')[-1]}: {e}")
+        if not tables:
+            return None
+        # Concatenate in shard order before shuffling, so the output only depends on the seed
+        tables.sort(key=lambda item: urls.index(item[0]))
+        result = concat_results([table for _, table in tables])
+        return result.take(rng.permutation(result.num_rows))
+
+    def _cached_extract_conversations(self, conversation_ids):
+        # Lookups are cached by the set of IDs, so repeated retrievals skip the shards entirely
+        cache_key = ResultCache.make_key("ids", self.dataset_revision, self.database is not None,
+                                         tuple(sorted(set(conversation_ids))))
+        result = self.result_cache.get(cache_key)
+        if result is None:
+            result = compact_results(self._extract_conversations(conversation_ids))
+            # Degraded-mode lookups may be incomplete, so they are not cached
+            if self.index_status in ("ready", "not needed"):
+                self.result_cache.put(cache_key, result)
+        return result
+
+    def _extract_conversations(self, conversation_ids, range_reads=None):
+        """
+        Reads conversations by ID, from the database, or from the row groups recorded in the conversation
+        index (scanning shards not covered by it). range_reads overrides the wrapper's range-read mode
+        for shards that are not in the shard cache.
+        """
+        range_reads = self.range_reads if range_reads is None else range_reads
+        if self.database is not None:
+            print(f"Querying {self.database.db_path} for {len(conversation_ids)} conversations")
+            return self.database.get_conversations(conversation_ids)
 
         # Create a lookup table for file names -> URLs
         file_url_map = {url.split("/")[-1]: url for url in self.parquet_urls}
 
-        # Group conversation IDs by file
+        if self.conversations_index is None:
+            return self._scan_for_conversations(conversation_ids, range_reads=range_reads)
+
+        # Group conversation IDs by file, keeping track of the row groups that hold them
         file_to_conversations = defaultdict(list)
-        for convid in conversation_ids:
-            if convid in self.conversations_index:
-                file_to_conversations[self.conversations_index[convid]].append(convid)
+        file_to_row_groups = defaultdict(set)
+        not_indexed = []
+        index_shards = self.index_shards
+        for convid, location in zip(conversation_ids, self.conversations_index.lookup_many(conversation_ids)):
+            # Entries of shards that changed since they were indexed are not used
+            if location is not None and location[0] in index_shards:
+                file_name, row_group, _ = location
+                file_to_conversations[file_name].append(convid)
+                file_to_row_groups[file_name].add(row_group)
+            else:
+                not_indexed.append(convid)
 
-        result_df = pd.DataFrame()
+        tables = []
+        unindexed_urls = [url for url in self.parquet_urls if url.split("/")[-1] not in index_shards]
+        if not_indexed and unindexed_urls:
+            # Shards missing from the index, or changed since it was built, may still hold these IDs
+            tables.append(self._scan_for_conversations(not_indexed, urls=unindexed_urls, range_reads=range_reads))
 
         for file_name, conv_ids in file_to_conversations.items():
             if file_name not in file_url_map:
@@ -134,172 +783,559 @@ class DatasetWrapper:
             print(f"Querying file: {file_name} for {len(conv_ids)} conversations")
 
             try:
-                r = self._safe_get(file_url)
-                if r == None:
-                    print(f"Timeout occurred for GET {file_url}. Skipping file {file_name}.")
-                    continue
+                row_groups = sorted(file_to_row_groups[file_name])
+                # Shards already in the local cache are always read locally
+                cached_path = self.shard_cache.get(file_name, self._shard_etag(file_url))
+                if range_reads and cached_path is None:
+                    table = self._read_remote_conversations(file_url, conv_ids, row_groups=row_groups)
+                    if table is None:
+                        continue
+                else:
+                    shard_path = cached_path or self._get_shard(file_url)
+                    if shard_path is None:
+                        print(f"Timeout occurred for GET {file_url}. Skipping file {file_name}.")
+                        continue
+                    # The index tells which row groups to read, so the rest of the shard is skipped
+                    table = read_conversations(pq.ParquetFile(shard_path), conv_ids, row_groups=row_groups)
 
-                with tempfile.NamedTemporaryFile(suffix=".parquet", delete=False) as tmp:
-                    tmp.write(r.content)
-                    tmp_path = tmp.name
-                try:
-                    conv_id_list = "', '".join(conv_ids)
-                    query_str = f"""
-                        SELECT * FROM read_parquet('{tmp_path}') 
-                        WHERE conversation_id IN ('{conv_id_list}')
-                    """
-                    df = duckdb.query(query_str).df()
-                finally:
-                    if os.path.exists(tmp_path):
-                        os.unlink(tmp_path)
-
-                if not df.empty:
-                    print(f"Found {len(df)} conversations in {file_name}")
-                    result_df = pd.concat([result_df, df], ignore_index=True)
+                if table.num_rows > 0:
+                    print(f"Found {table.num_rows} conversations in {file_name}")
+                    tables.append(table)
 
             except Exception as e:
                 print(f"Error processing {file_name}: {e}")
 
-        self.active_df = result_df
+        return concat_results(tables)
+    
+    def _scan_for_conversations(self, conversation_ids, urls=None, range_reads=None):
+        """
+        Degraded-mode ID lookup used while the conversation index is not available. Shards are scanned in
+        parallel, reading only the conversation_id column to find the row groups that hold the IDs (by range
+        requests in range-read mode). Shards already checkpointed by a running index build are used as a
+        partial index: they are skipped if they hold none of the IDs. Stops as soon as every ID is found.
+        """
+        urls = self.parquet_urls if urls is None else urls
+        wanted_keys, _ = ConversationIndex._encode(conversation_ids)
+        checkpoint_dir = f"{self.conversations_index_path.rstrip(os.sep)}.parts"
+        found = set()
+        tables = []
+        stop_event = threading.Event()
+
+        def scan(url):
+            file_name = url.split("/")[-1]
+            checkpoint_path = os.path.join(
+                checkpoint_dir, ShardCache.entry_name(file_name, self._shard_etag(url))[:-len(".parquet")] + ".npz")
+            row_groups = None
+            if os.path.exists(checkpoint_path):
+                with np.load(checkpoint_path) as checkpoint:
+                    matches = np.isin(checkpoint["ids"], wanted_keys)
+                    row_groups = np.unique(checkpoint["row_group"][matches]).tolist()
+                if not row_groups:
+                    return empty_result()
+            if stop_event.is_set():
+                return None
+            parquet_file = self._open_shard(url, stop_event=stop_event, range_reads=range_reads)
+            if parquet_file is None or stop_event.is_set():
+                return None
+            return read_conversations(parquet_file, conversation_ids, row_groups=row_groups)
+
+        print(f"Conversation index not available. Scanning {len(urls)} shard(s) for {len(conversation_ids)} conversations")
+        executor = ThreadPoolExecutor(max_workers=self.search_workers)
+        futures = {executor.submit(scan, url): url for url in urls}
         try:
-            self.active_conversation = Conversation(self.active_df.iloc[0])
-        except Exception as e:
-            print(f"No conversations available: {e}")
+            for future in as_completed(futures):
+                file_name = futures[future].split("/")[-1]
+                try:
+                    table = future.result()
+                except Exception as e:
+                    print(f"Error processing {file_name}: {e}")
+                    continue
+                if table is not None and table.num_rows > 0:
+                    print(f"Found {table.num_rows} conversations in {file_name}")
+                    tables.append(table)
+                    found.update(table.column("conversation_id").to_pylist())
+                if found >= set(conversation_ids):
+                    break
+        finally:
+            stop_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        return concat_results(tables)
 
-        return result_df
-    
-    def literal_text_search(self, filter_str, min_results=1):
-        # If filter_str is empty, sample random conversations
-        if filter_str == "":
-            result_df = self.extract_sample_conversations(50)
+    def _search_shard(self, url, filter_str, stop_event, role=None):
+        """
+        Runs the literal search on one shard. The searched text is the lowercased message content
+        (see search_columns.message_text), of the messages with the given role if role is set.
+        In order of preference:
+        - If the shard is covered by the trigram index, only its candidate rows are read and verified.
+        - Otherwise the shard's precomputed search column is scanned (and materialized first if missing),
+          and only the matching rows are read back from the shard. Role searches use the role's column, or
+          the column of all messages to narrow down the rows if the files have no role columns.
+        - Otherwise the conversation column of the whole shard is scanned.
+        Returns None if the search was cancelled or the shard could not be retrieved.
+        """
+        if stop_event.is_set():
+            return None
+        file_name = url.split("/")[-1]
+        etag = self._shard_etag(url)
+        query = normalize_query(filter_str)
+        column = search_column(role)
+        if self.trigram_index is not None and self.trigram_index.covers(file_name, etag):
+            rows = self.trigram_index.candidate_rows(file_name, query)
+            if rows is not None:
+                if len(rows) == 0:
+                    return empty_result()
+                parquet_file = self._open_shard(url, stop_event=stop_event)
+                if parquet_file is None or stop_event.is_set():
+                    return None
+                candidates = read_rows(parquet_file, rows)
+                return candidates.filter(pc.match_substring(message_text(candidates.column("conversation"), role=role), query))
+
+        search_path = self.search_columns.get(file_name, etag) if etag is not None else None
+        shard_path = None
+        if search_path is None:
+            shard_path = self._get_shard(url, stop_event=stop_event)
+            if shard_path is None:
+                if not stop_event.is_set():
+                    print(f"Timeout occurred for GET {url}. Skipping file {url}.")
+                return None
+            if stop_event.is_set():
+                return None
+            if self.materialize_search_columns and etag is not None:
+                print(f"Materializing search column for {file_name}")
+                search_path = self.search_columns.build(file_name, shard_path, etag=etag)
+
+        if search_path is not None:
+            narrowed = not self.search_columns.has_column(column)
+            rows = search_rows(search_path, query, column="text" if narrowed else column)
+            if len(rows) == 0:
+                return empty_result()
+            parquet_file = pq.ParquetFile(shard_path) if shard_path else self._open_shard(url, stop_event=stop_event)
+            if parquet_file is None or stop_event.is_set():
+                return None
+            table = read_rows(parquet_file, rows)
+            if narrowed:
+                table = table.filter(pc.match_substring(message_text(table.column("conversation"), role=role), query))
+            return table
+
+        matches = []
+        for batch in pq.ParquetFile(shard_path).iter_batches(batch_size=8192):
+            if stop_event.is_set():
+                return None
+            mask = pc.match_substring(message_text(batch.column("conversation"), role=role), query)
+            matches.append(pa.Table.from_batches([batch]).filter(mask))
+        return concat_results(matches)
+
+    def _cached_literal_text_search(self, filter_str, min_results, stop_event=None, report=None, role=None):
+        # Searches are case insensitive, so the cache key uses the lowercased text. Unknown roles raise ValueError
+        search_column(role)
+        cache_key = ResultCache.make_key("search", self.dataset_revision, SEARCH_TEXT_VERSION, self.database is not None,
+                                         filter_str.lower(), min_results, role)
+        result = self.result_cache.get(cache_key)
+        if result is None:
+            if report is None:
+                report = self.search_report = {"scanned": [], "cancelled": [], "failed": []}
+            result = compact_results(self._literal_text_search(filter_str, min_results, stop_event=stop_event,
+                                                               report=report, role=role))
+            # Incomplete results (shards that failed to download, cancelled searches) are not cached
+            if not report["failed"] and not (stop_event is not None and stop_event.is_set()):
+                self.result_cache.put(cache_key, result)
+        return result
+
+    def _literal_text_search(self, filter_str, min_results, stop_event=None, report=None, role=None):
+        """
+        Runs a literal search without touching the active result set. Setting stop_event (from another
+        thread) cancels the search; shards are then reported as cancelled. The shards scanned, cancelled
+        and failed are recorded in report, which defaults to a fresh self.search_report.
+        """
+        if report is None:
+            report = self.search_report = {"scanned": [], "cancelled": [], "failed": []}
+        if self.database is not None:
+            result = self.database.search(filter_str, min_results=min_results,
+                                          limit=max(min_results, self.database_search_limit), role=role)
+            print(f"Found {result.num_rows} result(s) in {self.database.db_path}")
+            return result
         urls = self.parquet_urls.copy()
         random.shuffle(urls)
         
-        result_df = pd.DataFrame()
+        tables = []
+        stop_event = stop_event or threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.search_workers)
+        futures = {executor.submit(self._search_shard, url, filter_str, stop_event, role): url for url in urls}
+        try:
+            for future in as_completed(futures):
+                file_name = futures[future].split('/')[-1]
+                try:
+                    table = future.result()
+                except Exception as e:
+                    print(f"Error searching {file_name}: {e}")
+                    report["failed"].append(file_name)
+                    continue
+                if table is None:
+                    (report["cancelled"] if stop_event.is_set() else report["failed"]).append(file_name)
+                    continue
+                report["scanned"].append(file_name)
+                print(f"Found {table.num_rows} result(s) in {file_name}")
 
-        for url in urls:
-            print(f"Querying file: {url}")
-            r = self._safe_get(url)
-            if r == None:
-                print(f"Timeout occurred for GET {url}. Skipping file {url}.")
-                continue
-            with tempfile.NamedTemporaryFile(suffix=".parquet", delete=False) as tmp:
-                tmp.write(r.content)
-                tmp_path = tmp.name
+                if table.num_rows > 0:
+                    tables.append(table)
 
-            try:
-                query_str = f"""
-                    SELECT * FROM read_parquet('{tmp_path}') 
-                    WHERE contains(lower(cast(conversation as VARCHAR)), lower('{filter_str}'))
-                    """
-                df = duckdb.query(query_str).df()
-            finally:
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-
-            print(f"Found {len(df)} result(s) in {url.split('/')[-1]}")
-            
-            if len(df) > 0:
-                result_df = pd.concat([result_df, df], ignore_index=True)
-                
-            if len(result_df) >= min_results:
-                break
-        if len(result_df) == 0:
-            print("No results found. Returning empty DataFrame.")
-            placeholder_row = {'conversation_id': "No result found",
-                               'model': "-",
-                               'conversation': [
-                                {'content': '-', 'role': 'user'},
-                                {'content': '-', 'role': 'assistant'}
-                               ],
-                               'turn': "-",
-                               'language': "-",
-                               'openai_moderation': "[{'-': '-', '-': '-'}]",
-                               'redacted': "-",}
-            result_df = pd.DataFrame([placeholder_row])
-            print(result_df)
-        self.active_df = result_df
-        try:
-            self.active_conversation = Conversation(self.active_df.iloc[0])
-        except Exception as e:
-            print(f"No conversations available: {e}")
-        return result_df
-    
-    def create_conversations_index(self, output_index_file="json/conversations_index.json"):
+                if sum(t.num_rows for t in tables) >= min_results or stop_event.is_set():
+                    break
+        finally:
+            # Stop running tasks at their next checkpoint and drop those that have not started
+            stop_event.set()
+            reported = set(sum(report.values(), []))
+            for future, url in futures.items():
+                future.cancel()
+                if url.split('/')[-1] not in reported:
+                    report["cancelled"].append(url.split('/')[-1])
+            executor.shutdown(wait=False, cancel_futures=True)
+        print(f"Scanned {len(report['scanned'])} of {len(urls)} shard(s)")
+        return concat_results(tables)
+
+    def refresh_warm_cache(self, n_conversations=2000, seed=None):
         """
-        Builds an index of conversation IDs from a list of Parquet file URLs.
-        Stores the index as a JSON mapping conversation IDs to their respective file names.
+        Rewrites the warm cache that sessions start from with conversations drawn uniformly from the shards
+        in the local shard cache. Nothing is downloaded. This is meant to be run offline, once the shard
+        cache holds some shards (e.g. after create_conversations_index).
+
+        Parameters:
+        - n_conversations (int): Number of conversations to write.
+        - seed (int): Random seed.
+
+        Returns:
+        - int: Number of conversations written.
         """
-        index = {}
+        if self.warm_cache is None:
+            print("No warm cache path configured")
+            return 0
+        urls = [url for url in self.parquet_urls if self.shard_cache.get(url.split("/")[-1], self._shard_etag(url))]
+        if not urls and self.database is None:
+            print("No shards in the shard cache. Warm cache not refreshed.")
+            return 0
+        table = self._draw_sample(n_conversations, seed=seed, urls=urls)
+        if table is None or table.num_rows == 0:
+            return 0
+        self.warm_cache.write(table)
+        return table.num_rows
 
+    def create_trigram_index(self, output_index_dir="index/trigrams", segment_rows=10000):
+        """
+        Builds the trigram index used by literal_text_search, one shard at a time.
+        Shards are read through the shard cache. This is meant to be run offline.
+        """
         for url in self.parquet_urls:
-            file_name = url.split('/')[-1]  # Extract file name from URL
-            print(f"Indexing file: {file_name}")
+            file_name = url.split('/')[-1]
+            print(f"Building trigram index for {file_name}")
+            shard_path = self._get_shard(url)
+            if shard_path is None:
+                print(f"Could not download {file_name}. Skipping.")
+                continue
+            meta = TrigramIndex.build_shard(output_index_dir, file_name, shard_path,
+                                           etag=self._shard_etag(url), segment_rows=segment_rows)
+            print(f"Indexed {meta['num_rows']} rows of {file_name} in {len(meta['segments'])} segment(s)")
+        self.trigram_index = TrigramIndex(output_index_dir)
+        return self.trigram_index
 
-            try:
-                # Download the file temporarily
-                r = requests.get(url, headers=self.headers)
-                with tempfile.NamedTemporaryFile(suffix=".parquet", delete=False) as tmp:
-                    tmp.write(r.content)
-                    # tmp.flush()
-                    tmp_path = tmp.name
+    def create_database(self):
+        """
+        Ingests every shard into the local DuckDB database (skipping shards already ingested at the
+        same ETag) and builds its indexes. Shards are read through the shard cache.
+        """
+        ingested = self.database.ingested_shards()
+        for url in self.parquet_urls:
+            file_name = url.split('/')[-1]
+            etag = self._shard_etag(url)
+            if file_name in ingested and (etag is None or ingested[file_name] == etag):
+                print(f"{file_name} already in the database. Skipping.")
+                continue
+            shard_path = self._get_shard(url)
+            if shard_path is None:
+                print(f"Could not download {file_name}. Skipping.")
+                continue
+            self.database.ingest_shard(file_name, shard_path, etag=etag)
+        print("Building database indexes")
+        self.database.build_fts_index()
+        return self.database
+
+    def _index_shard(self, url, checkpoint_dir):
+        """
+        Extracts the conversation IDs of one shard for the index, reusing the entries of the current index
+        (if the shard is still up to date there) or its checkpoint if there is one.
+
+        Returns:
+        - tuple: (file_name, ids, row_group, row, seconds, bytes), or None if the shard could not be retrieved.
+        """
+        file_name = url.split('/')[-1]  # Extract file name from URL
+        index = self.conversations_index
+        if index is not None and file_name in self.index_shards:
+            return (file_name, *index.shard_entries(file_name), 0.0, 0)
+        etag = self._shard_etag(url)
+        checkpoint_path = os.path.join(checkpoint_dir, ShardCache.entry_name(file_name, etag)[:-len(".parquet")] + ".npz")
+        if os.path.exists(checkpoint_path):
+            with np.load(checkpoint_path) as checkpoint:
+                print(f"Resuming {file_name} from checkpoint")
+                return file_name, checkpoint["ids"], checkpoint["row_group"], checkpoint["row"], 0.0, 0
+        start = time.time()
+        # Get the file through the shard cache so later queries can reuse it
+        shard_path = self._get_shard(url)
+        if shard_path is None:
+            print(f"Could not download {file_name}. Skipping.")
+            return None
+        ids, row_group, row = ConversationIndex.read_shard_ids(shard_path)
+        tmp_path = f"{checkpoint_path}.tmp.npz"
+        np.savez(tmp_path, ids=ids, row_group=row_group, row=row)
+        os.replace(tmp_path, checkpoint_path)
+        return file_name, ids, row_group, row, time.time() - start, os.path.getsize(shard_path)
+
+    def create_conversations_index(self, output_index_dir="index/conversations", workers=None):
+        """
+        Builds an index of conversation IDs from a list of Parquet file URLs.
+        Stores it as a memory-mapped ConversationIndex mapping conversation IDs to their file name,
+        row group and row offset.
+
+        Shards are downloaded and indexed in parallel by `workers` threads (search_workers by default).
+        Each finished shard is checkpointed under '<output_index_dir>.parts', so an interrupted build
+        resumes where it stopped. Throughput is printed as shards complete.
+        """
+        if not self.parquet_urls:
+            raise ValueError("No shards listed in the manifest. Not building an empty index.")
+        checkpoint_dir = f"{output_index_dir.rstrip(os.sep)}.parts"
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        shard_ids = {}
+        start = time.time()
+        total_rows, total_bytes = 0, 0
+
+        with ThreadPoolExecutor(max_workers=workers or self.search_workers) as executor:
+            futures = {executor.submit(self._index_shard, url, checkpoint_dir): url for url in self.parquet_urls}
+            for future in as_completed(futures):
+                file_name = futures[future].split('/')[-1]
                 try:
-                    query = f"SELECT conversation_id FROM read_parquet('{tmp_path}')"
-                    df = duckdb.query(query).to_df()
-                finally:
-                    if os.path.exists(tmp_path):
-                        os.unlink(tmp_path)
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error indexing {file_name}: {e}")
+                    continue
+                if result is None:
+                    continue
+                file_name, ids, row_group, row, seconds, num_bytes = result
+                shard_ids[file_name] = (file_name, ids, row_group, row)
+                self.index_progress = (len(shard_ids), len(self.parquet_urls))
+                total_rows += len(ids)
+                total_bytes += num_bytes
+                elapsed = max(time.time() - start, 1e-9)
+                print(f"Indexed {len(ids)} conversations from {file_name} in {seconds:.1f}s "
+                      f"({len(shard_ids)}/{len(self.parquet_urls)} shards, {total_rows / elapsed:,.0f} rows/s, "
+                      f"{total_bytes / elapsed / 1024**2:,.1f} MB/s)")
 
-                # Map conversation IDs to file name (not the full URL)
-                for _, row in df.iterrows():
-                    index[row["conversation_id"]] = file_name
+        # Save index for fast lookup, keeping the shard order of the URL list
+        indexed_urls = [url for url in self.parquet_urls if url.split('/')[-1] in shard_ids]
+        if not indexed_urls:
+            raise ValueError("No shard could be indexed. Keeping the previous index.")
+        ordered = [shard_ids[url.split('/')[-1]] for url in indexed_urls]
+        index = ConversationIndex.build(output_index_dir, ordered, etags=[self._etags.get(url) for url in indexed_urls])
+        if len(ordered) == len(self.parquet_urls):
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        else:
+            print(f"Indexed {len(ordered)} of {len(self.parquet_urls)} shards. Run again to resume from {checkpoint_dir}.")
+        return index
 
-            except Exception as e:
-                print(f"Error indexing {file_name}: {e}")
 
-        # Save index for fast lookup
-        with open(output_index_file, "w", encoding="utf-8") as f:
-            json.dump(index, f, indent=2)
+class DatasetCursor(_ActiveResultSet):
+    def __init__(self, wrapper, cache_size=50):
+        """
+        Per-user view of a shared DatasetWrapper: the active result set and conversation, plus the
+        report of the last search. Everything else (manifest, index, shard and result caches, database,
+        sample pool, HTTP session) belongs to the wrapper and is shared by every cursor, so one wrapper
+        per process can serve many concurrent users. Attributes not defined here (index_status,
+        parquet_urls, ...) are read from the wrapper.
+
+        Parameters:
+        - wrapper (DatasetWrapper): Shared wrapper.
+        - cache_size (int): Number of conversations of the initial result set, sampled from the warm cache.
+        """
+        self.wrapper = wrapper
+        self.search_report = {"scanned": [], "cancelled": [], "failed": []}
+        self.active_conversation = None
+        self._set_active_df(wrapper._initial_sample(cache_size))
+
+    def __getattr__(self, name):
+        # Only called for attributes the cursor does not have itself
+        if name == "wrapper":
+            raise AttributeError(name)
+        return getattr(self.wrapper, name)
+
+
+class _ArrowMessage(Mapping):
+    """
+    Read-only dict-like view of one message of an Arrow conversation. Fields are read from the Arrow
+    arrays when accessed. Like the messages of dict rows, it only has the stored fields; turn numbers
+    come from Conversation.turns() and Conversation.add_turns().
+    """
+    __slots__ = ("_messages", "_index")
+
+    def __init__(self, messages, index):
+        self._messages = messages
+        self._index = index
+
+    def __getitem__(self, key):
+        if key not in self._messages.fields:
+            raise KeyError(key)
+        return self._messages.values.field(key)[self._messages.start + self._index].as_py()
+
+    def __iter__(self):
+        return iter(self._messages.fields)
+
+    def __len__(self):
+        return len(self._messages.fields)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class _ArrowMessages(Sequence):
+    """
+    Read-only sequence of the messages of one conversation, over the list offsets and struct values of an
+    Arrow list<struct<content, role>> array. No per-message objects are built until a message is accessed.
+    """
+    __slots__ = ("values", "start", "stop", "fields", "_turns")
+
+    def __init__(self, list_array):
+        offsets = list_array.offsets
+        self.values = list_array.values
+        self.start = offsets[0].as_py()
+        self.stop = offsets[1].as_py()
+        self.fields = [field.name for field in self.values.type]
+        self._turns = None
 
-        return output_index_file
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return _ArrowMessage(self, index)
+
+    def turns(self):
+        """
+        Returns the turn number of each message (a turn starts at each user message), computed once from the roles.
+        """
+        if self._turns is None:
+            roles = self.values.field("role").slice(self.start, len(self))
+            self._turns = np.cumsum(np.asarray(pc.fill_null(pc.equal(roles, "user"), False)))
+        return self._turns
+
+
+class _RowMetadata(Mapping):
+    """
+    Read-only mapping over the metadata fields of a conversation row (every field but 'conversation').
+    Arrow values are converted to Python objects when accessed.
+    """
+    __slots__ = ("_row",)
+
+    def __init__(self, row):
+        self._row = row
+
+    def _keys(self):
+        keys = self._row.column_names if isinstance(self._row, (pa.Table, pa.RecordBatch)) else self._row.keys()
+        return [key for key in keys if key != "conversation"]
+
+    def __getitem__(self, key):
+        if key == "conversation":
+            raise KeyError(key)
+        if isinstance(self._row, (pa.Table, pa.RecordBatch)):
+            if key not in self._row.column_names:
+                raise KeyError(key)
+            value = self._row.column(key)[0].as_py()
+            # Conversation IDs of compact result sets are 16-byte keys
+            return value.hex() if isinstance(value, bytes) else value
+        return self._row[key]
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __repr__(self):
+        return repr(dict(self))
 
 
 class Conversation:
-    def __init__(self, data):
+    __slots__ = ("_row", "_messages")
+
+    def __init__(self, data, row=None):
         """
-        Initialize a conversation object either from conversation data directly or from a DataFrame row.
-        
+        Read-only view of a conversation and its metadata, built from conversation data directly, from a
+        DataFrame row, or from a row of an Arrow table.
+
+        Nothing is copied at construction. With Arrow data, messages are read from the Arrow arrays on access
+        and metadata fields are converted when requested. Turn numbers are computed on demand from the roles.
+
         Parameters:
-        - data: Can be either a list of conversation messages or a pandas Series/dict containing conversation data
-        """
-        # Handle both direct conversation data and DataFrame row
-        if isinstance(data, (pd.Series, dict)):
-            # Store all metadata separately
-            self.conversation_metadata = {}
-            for key, value in (data.items() if isinstance(data, pd.Series) else data.items()):
-                if key == 'conversation':
-                    self.conversation_data = value
-                else:
-                    self.conversation_metadata[key] = value
+        - data: A list of conversation messages, a pandas Series/dict containing conversation data, or a
+          pyarrow Table/RecordBatch.
+        - row (int): Row of the Arrow table to view. Required for Arrow data.
+        """
+        if isinstance(data, (pa.Table, pa.RecordBatch)):
+            # Zero-copy single-row slice
+            self._row = data.slice(row, 1)
+            self._messages = None
+        elif isinstance(data, (pd.Series, dict)):
+            self._row = data
+            self._messages = None
         else:
             # Direct initialization with conversation data
-            self.conversation_data = data
-            self.conversation_metadata = {}
+            self._row = {}
+            self._messages = data
+
+    @property
+    def conversation_data(self):
+        """
+        The messages of the conversation: a sequence of dict-like messages with 'role' and 'content'.
+        """
+        if self._messages is None:
+            if isinstance(self._row, (pa.Table, pa.RecordBatch)):
+                column = self._row.column("conversation")
+                if isinstance(column, pa.ChunkedArray):
+                    column = next(chunk for chunk in column.chunks if len(chunk) > 0)
+                self._messages = _ArrowMessages(column)
+            else:
+                self._messages = self._row.get("conversation", [])
+        return self._messages
+
+    @property
+    def conversation_metadata(self):
+        """
+        Read-only mapping of the metadata fields of the conversation (every field but 'conversation').
+        """
+        return _RowMetadata(self._row)
+
+    def turns(self):
+        """
+        Returns the turn number of each message: turns are numbered from 1 and a new turn starts at each user message.
+
+        Returns:
+        - numpy.ndarray: One turn number per message.
+        """
+        messages = self.conversation_data
+        if isinstance(messages, _ArrowMessages):
+            return messages.turns()
+        return np.cumsum([message['role'] == 'user' for message in messages], dtype=np.int64)
 
     def add_turns(self):
         """
-        Adds a 'turn' key to each dictionary in the conversation,
+        Returns the messages as dictionaries with a 'turn' key added,
         identifying the turn (pair of user and assistant messages).
+        The underlying conversation data is not modified.
 
         Returns:
-        - list: The updated conversation with 'turn' keys added.
+        - list: The conversation with 'turn' keys added.
         """
-        turn_counter = 0
-        for message in self.conversation_data:
-            if message['role'] == 'user':
-                turn_counter += 1
-            message['turn'] = turn_counter
-        return self.conversation_data
+        return [{**message, 'turn': int(turn)} for message, turn in zip(self.conversation_data, self.turns())]
     
     def pretty_print(self, user_prefix, assistant_prefix, width=80):
         """
@@ -0,0 +1,157 @@
+import io
+import numpy as np
+import requests
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+
+class HTTPRangeFile(io.RawIOBase):
+    def __init__(self, url, headers=None, timeout=20, size=None, session=None):
+        """
+        Read-only, seekable file object over HTTP that fetches only the byte ranges that are read.
+        It lets pyarrow open a remote parquet file and read its footer and selected column chunks
+        without downloading the whole file.
+
+        Parameters:
+        - url (str): URL of the remote file. The server must support Range requests.
+        - headers (dict): Extra request headers, e.g. authorization.
+        - timeout (int): Timeout in seconds for each request.
+        - size (int): File size in bytes. Retrieved with a HEAD request if not provided.
+        - session (requests.Session): Session used for the requests. Defaults to the requests module.
+        """
+        self.url = url
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.session = session or requests
+        self.bytes_fetched = 0
+        self.requests_made = 0
+        self._pos = 0
+        if size is None:
+            response = self.session.head(url, allow_redirects=True, headers=self.headers, timeout=self.timeout)
+            response.raise_for_status()
+            size = int(response.headers["Content-Length"])
+        self.size = size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self._pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self._pos
+        end = min(self._pos + size, self.size)
+        if end <= self._pos:
+            return b""
+        headers = dict(self.headers, Range=f"bytes={self._pos}-{end - 1}")
+        response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+        if response.status_code != 206:
+            raise ValueError(f"Range request to {self.url} failed. Status code: {response.status_code}")
+        data = response.content
+        self.requests_made += 1
+        self.bytes_fetched += len(data)
+        self._pos += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def open_remote_parquet(url, headers=None, timeout=20, metadata=None, size=None, session=None):
+    """
+    Opens a remote parquet file for range reads.
+
+    Parameters:
+    - metadata (pyarrow.parquet.FileMetaData): Previously fetched footer. When given, the footer is not requested again.
+    - size (int): File size in bytes, if already known. Saves a HEAD request.
+
+    Returns:
+    - tuple: (pyarrow.parquet.ParquetFile, HTTPRangeFile). The range file exposes transfer counters.
+    """
+    range_file = HTTPRangeFile(url, headers=headers, timeout=timeout, size=size, session=session)
+    parquet_file = pq.ParquetFile(range_file, metadata=metadata, pre_buffer=True)
+    return parquet_file, range_file
+
+
+def find_row_groups(parquet_file, conversation_ids, id_column="conversation_id"):
+    """
+    Returns the row groups of a parquet file that hold any of the given conversation IDs.
+    Only the ID column is read, in a single coalesced pass over all row groups.
+
+    Returns:
+    - list: Sorted row group indices.
+    """
+    id_set = pa.array(list(conversation_ids), type=pa.string())
+    ids = parquet_file.read(columns=[id_column]).column(id_column)
+    matches = pc.indices_nonzero(pc.is_in(ids, value_set=id_set)).to_numpy()
+    row_group_ends = np.cumsum([parquet_file.metadata.row_group(i).num_rows
+                                for i in range(parquet_file.num_row_groups)])
+    return sorted(set(np.searchsorted(row_group_ends, matches, side="right").tolist()))
+
+
+def read_conversations(parquet_file, conversation_ids, row_groups=None, columns=None, id_column="conversation_id"):
+    """
+    Reads the rows matching the given conversation IDs, fetching only the row groups and columns needed.
+
+    Parameters:
+    - parquet_file (pyarrow.parquet.ParquetFile): File opened with open_remote_parquet (or a local one).
+    - conversation_ids (list): Conversation IDs to retrieve.
+    - row_groups (list): Row groups holding the IDs. Located with find_row_groups if not provided.
+    - columns (list): Columns to read. All columns if None.
+
+    Returns:
+    - pyarrow.Table: The matching rows.
+    """
+    if row_groups is None:
+        row_groups = find_row_groups(parquet_file, conversation_ids, id_column=id_column)
+    if columns is not None and id_column not in columns:
+        columns = [id_column] + list(columns)
+    if not row_groups:
+        empty_table = parquet_file.schema_arrow.empty_table()
+        return empty_table if columns is None else empty_table.select(columns)
+    table = parquet_file.read_row_groups(row_groups, columns=columns)
+    id_set = pa.array(list(conversation_ids), type=pa.string())
+    return table.filter(pc.is_in(table.column(id_column), value_set=id_set))
+
+
+def read_rows(parquet_file, rows, columns=None):
+    """
+    Reads specific rows of a parquet file, given as row numbers within the file.
+    Only the row groups holding those rows are fetched.
+
+    Returns:
+    - pyarrow.Table: The rows, in the order given.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    row_group_sizes = np.array([parquet_file.metadata.row_group(i).num_rows
+                                for i in range(parquet_file.num_row_groups)], dtype=np.int64)
+    row_group_ends = np.cumsum(row_group_sizes)
+    row_group_of_row = np.searchsorted(row_group_ends, rows, side="right")
+    row_groups = np.unique(row_group_of_row)
+    if len(row_groups) == 0:
+        empty_table = parquet_file.schema_arrow.empty_table()
+        return empty_table if columns is None else empty_table.select(columns)
+    table = parquet_file.read_row_groups(row_groups.tolist(), columns=columns)
+    # Position of each selected row group's first row in the table that was read
+    table_offsets = np.zeros(parquet_file.num_row_groups, dtype=np.int64)
+    table_offsets[row_groups] = np.concatenate([[0], np.cumsum(row_group_sizes[row_groups])[:-1]])
+    positions = rows - (row_group_ends - row_group_sizes)[row_group_of_row] + table_offsets[row_group_of_row]
+    return table.take(pa.array(positions))
@@ -0,0 +1,170 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class ResultCache:
+    def __init__(self, max_bytes=256 * 1024**2, ttl=3600, persist_dir=None, max_disk_bytes=1024**3, verbose=True):
+        """
+        LRU + TTL cache of query results (pyarrow Tables), keyed by a normalized query.
+
+        Entries live in memory up to a byte budget, least recently used first out, and expire after ttl
+        seconds. With persist_dir, non-empty results are also written as parquet files, so they survive
+        restarts and are shared by processes using the same directory; the file age is used for the TTL.
+        The files are kept within their own byte budget: expired files go first, then the oldest ones.
+        Hit, miss, eviction and expiration counters are kept in `stats` to help size the cache.
+
+        Parameters:
+        - max_bytes (int): Memory budget for cached results.
+        - ttl (float): Seconds an entry stays valid. None for no expiration.
+        - persist_dir (str): Directory for the on-disk parquet copies. None to keep results in memory only.
+        - max_disk_bytes (int): Disk budget for the parquet copies in persist_dir.
+        - verbose (bool): Print cache hits.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.persist_dir = persist_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.verbose = verbose
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Builds a cache key from the parts of a normalized query, e.g. ("search", revision, text, min_results).
+        """
+        return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _size(table):
+        # Arrow buffer sizes account for nested lists and structs
+        return table.nbytes
+
+    def _expired(self, created_at):
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _path(self, key):
+        return os.path.join(self.persist_dir, f"{key}.parquet")
+
+    def get(self, key):
+        """
+        Returns the cached Table for key, or None on a miss or if the entry expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                table, size, created_at = entry
+                if not self._expired(created_at):
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    if self.verbose:
+                        print("Result cache hit")
+                    return table
+                del self._entries[key]
+                self._bytes -= size
+                self.stats["expirations"] += 1
+        if self.persist_dir:
+            path = self._path(key)
+            try:
+                created_at = os.path.getmtime(path)
+                if not self._expired(created_at):
+                    table = pq.read_table(path)
+                    with self._lock:
+                        self.stats["disk_hits"] += 1
+                    self._put_memory(key, table, created_at)
+                    if self.verbose:
+                        print("Result cache hit (disk)")
+                    return table
+                os.unlink(path)
+                with self._lock:
+                    self.stats["expirations"] += 1
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def _put_memory(self, key, table, created_at):
+        size = self._size(table)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (table, size, created_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.stats["evictions"] += 1
+
+    def put(self, key, table):
+        """
+        Stores a result. Results larger than the whole budget are not kept in memory.
+        """
+        self._put_memory(key, table, time.time())
+        if self.persist_dir and table.num_rows > 0:
+            # Unique temporary file, since persist_dir can be shared by several processes
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{key}.", suffix=".tmp", dir=self.persist_dir)
+            os.close(fd)
+            try:
+                pq.write_table(table, tmp_path)
+                os.replace(tmp_path, self._path(key))
+            except (pa.ArrowException, TypeError, ValueError, OSError) as e:
+                print(f"Could not persist cached result: {e}")
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                return
+            self.evict_disk()
+
+    def evict_disk(self):
+        """
+        Deletes persisted results until the files in persist_dir fit in max_disk_bytes: expired files first,
+        then the oldest ones.
+        """
+        entries = []
+        for name in os.listdir(self.persist_dir):
+            if not name.endswith(".parquet"):
+                continue
+            path = os.path.join(self.persist_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for created_at, size, path in sorted(entries):
+            if total <= self.max_disk_bytes and not self._expired(created_at):
+                continue
+            try:
+                os.unlink(path)
+                total -= size
+                with self._lock:
+                    self.stats["evictions" if not self._expired(created_at) else "expirations"] += 1
+            except FileNotFoundError:
+                pass
+
+    def size(self):
+        """
+        Returns the number of bytes held in memory.
+        """
+        return self._bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.persist_dir:
+            for name in os.listdir(self.persist_dir):
+                if name.endswith(".parquet"):
+                    os.unlink(os.path.join(self.persist_dir, name))
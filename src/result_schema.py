@@ -0,0 +1,108 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+from conversation_index import ConversationIndex
+
+# Compact types of the result set columns. Other columns (conversation, openai_moderation, display columns)
+# keep the types they are read with
+RESULT_TYPES = {
+    "conversation_id": pa.binary(16),
+    "model": pa.dictionary(pa.int32(), pa.string()),
+    "turn": pa.int16(),
+    "language": pa.dictionary(pa.int32(), pa.string()),
+    "redacted": pa.bool_(),
+}
+
+RESULT_SCHEMA = pa.schema([
+    ("conversation_id", RESULT_TYPES["conversation_id"]),
+    ("model", RESULT_TYPES["model"]),
+    ("conversation", pa.list_(pa.struct([("content", pa.string()), ("role", pa.string())]))),
+    ("turn", RESULT_TYPES["turn"]),
+    ("language", RESULT_TYPES["language"]),
+    ("redacted", RESULT_TYPES["redacted"]),
+])
+
+
+def empty_result():
+    """
+    Returns the empty result set: a table with no rows and the compact result schema. Searches and lookups
+    that find nothing return it, so callers check num_rows instead of looking for a placeholder row.
+    """
+    return RESULT_SCHEMA.empty_table()
+
+
+def compact_results(table):
+    """
+    Converts a query result to the compact result schema: dictionary-encoded model and language, 16-byte
+    binary conversation IDs, int16 turn and boolean redacted. Columns already compact, or missing, are
+    left as they are, so the conversion can be applied more than once. IDs that are not 32 hex digits
+    are kept as strings.
+
+    Parameters:
+    - table (pyarrow.Table): Query result.
+
+    Returns:
+    - pyarrow.Table: The result with compact column types.
+    """
+    for name, column_type in RESULT_TYPES.items():
+        if name not in table.column_names or table.schema.field(name).type == column_type:
+            continue
+        column = table.column(name)
+        if name == "conversation_id":
+            try:
+                keys = ConversationIndex.hex_to_keys(column.combine_chunks())
+            except ValueError:
+                continue
+            column = pa.FixedSizeBinaryArray.from_buffers(column_type, len(keys), [None, pa.py_buffer(keys)])
+        elif pa.types.is_dictionary(column_type):
+            column = pc.dictionary_encode(column)
+        else:
+            column = pc.cast(column, column_type)
+        table = table.set_column(table.column_names.index(name), name, column)
+    return table
+
+
+def with_hex_ids(table):
+    """
+    Converts binary conversation IDs back to 32-character hex strings, for display and for pandas.
+    Only the ID column is converted; the other columns are not copied.
+    """
+    if "conversation_id" not in table.column_names or not pa.types.is_fixed_size_binary(table.schema.field("conversation_id").type):
+        return table
+    column = table.column("conversation_id")
+    hex_ids = pa.chunked_array([ConversationIndex.keys_to_hex(chunk) for chunk in column.chunks], type=pa.string())
+    return table.set_column(table.column_names.index("conversation_id"), "conversation_id", hex_ids)
+
+
+def to_pandas(table):
+    """
+    Converts a result set to a DataFrame, with hex conversation IDs and categorical model and language.
+    """
+    return with_hex_ids(table).to_pandas()
+
+
+def find_conversation(table, conversation_id):
+    """
+    Returns the rows of a result set with the given conversation ID (hex string), whatever the type of
+    the ID column.
+    """
+    column = table.column("conversation_id")
+    if pa.types.is_fixed_size_binary(column.type):
+        try:
+            key = bytes.fromhex(conversation_id)
+        except (ValueError, TypeError):
+            return table.slice(0, 0)
+        if len(key) != column.type.byte_width:
+            return table.slice(0, 0)
+        return table.filter(pc.equal(column, pa.scalar(key, column.type)))
+    return table.filter(pc.equal(column, conversation_id))
+
+
+def memory_report(table):
+    """
+    Reports the memory held by a result set.
+
+    Returns:
+    - dict: {"rows": int, "bytes": int, "columns": {column name: bytes}}, sizes from the Arrow buffers.
+    """
+    return {"rows": table.num_rows, "bytes": table.nbytes,
+            "columns": {name: table.column(name).nbytes for name in table.column_names}}
@@ -0,0 +1,137 @@
+import os
+import tempfile
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class SamplePool:
+    def __init__(self, draw, path="cache/sample_pool.parquet", pool_size=250, low_water=50, verbose=True):
+        """
+        Bounded pool of pre-sampled conversations that serves random samples without waiting for the network.
+
+        The pool is persisted as a parquet file, so it survives restarts. The file is read by the refill thread
+        (or by the first take()), not at construction, so creating the pool costs no I/O. take() pops
+        conversations from the front of the pool; once fewer than low_water remain, a background thread draws
+        new samples with draw() until the pool holds pool_size conversations again, and saves it.
+        Conversations are served at most once per pool fill.
+
+        Parameters:
+        - draw (callable): draw(n) returns a pyarrow Table with n random conversations.
+        - path (str): Parquet file where the pool is persisted.
+        - pool_size (int): Number of conversations the pool is refilled to.
+        - low_water (int): Pool size below which a refill is started.
+        - verbose (bool): Print refill progress.
+        """
+        self.draw = draw
+        self.path = path
+        self.pool_size = pool_size
+        self.low_water = low_water
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._dirty = False
+        self._thread = None
+        self._table = None
+
+    def _load(self):
+        with self._lock:
+            if self._table is None:
+                try:
+                    self._table = pq.read_table(self.path).slice(0, self.pool_size)
+                except (FileNotFoundError, pa.ArrowException, OSError):
+                    self._table = pa.table({})
+            return self._table
+
+    def __len__(self):
+        return self._load().num_rows
+
+    def seed(self, table):
+        """
+        Adds conversations to the pool, e.g. to migrate a previous cache of sampled chats.
+        """
+        self._load()
+        with self._lock:
+            self._table = self._concat(self._table, table)
+            self._dirty = True
+        self._wake.set()
+
+    def _concat(self, pool, table):
+        # Compacted into one chunk per column, so the pool does not keep the buffers of rows already taken alive
+        tables = [t for t in (pool, table) if t.num_columns > 0]
+        if not tables:
+            return pool
+        return pa.concat_tables(tables, promote_options="permissive").slice(0, self.pool_size).combine_chunks()
+
+    def peek(self):
+        """
+        Returns the conversations in the pool without removing them (a zero-copy view).
+        """
+        self._load()
+        with self._lock:
+            return self._table
+
+    def take(self, n_samples):
+        """
+        Removes and returns up to n_samples conversations from the pool, waking the refill thread if the pool
+        drops below the low-water mark. Returns fewer rows (possibly none) if the pool is short.
+        The returned Table is a zero-copy slice of the pool.
+        """
+        self._load()
+        with self._lock:
+            taken = self._table.slice(0, min(n_samples, self._table.num_rows))
+            self._table = self._table.slice(taken.num_rows)
+            self._dirty = True
+        self._wake.set()
+        return taken
+
+    def size(self):
+        """
+        Returns the number of bytes held by the pool.
+        """
+        return self._table.nbytes if self._table is not None else 0
+
+    def save(self):
+        with self._lock:
+            table = self._table
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(self.path)}.", suffix=".tmp",
+                                        dir=os.path.dirname(self.path) or ".")
+        os.close(fd)
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def _refill(self):
+        missing = self.pool_size - len(self)
+        if self.verbose:
+            print(f"Refilling sample pool with {missing} conversations")
+        table = self.draw(missing)
+        if table is None or table.num_rows == 0:
+            return False
+        with self._lock:
+            self._table = self._concat(self._table, table)
+            self._dirty = True
+        return True
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                if len(self) < self.low_water:
+                    self._refill()
+                if self._dirty:
+                    self.save()
+            except Exception as e:
+                print(f"Sample pool refill failed: {e}")
+
+    def start(self):
+        """
+        Starts the background refill thread (a daemon) and triggers a first check of the pool size.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="sample-pool", daemon=True)
+            self._thread.start()
+        self._wake.set()
+        return self._thread
@@ -0,0 +1,258 @@
+import os
+import re
+import hashlib
+import tempfile
+import threading
+import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Bumped whenever the way search text is derived changes, so stale derived files are rebuilt
+SEARCH_TEXT_VERSION = "messages-v1"
+
+# Message roles searches can be restricted to
+SEARCH_ROLES = ("user", "assistant")
+
+
+def search_column(role=None):
+    """
+    Returns the column of the derived search files holding the search text of the given role:
+    'text' for all messages, 'text_user' or 'text_assistant' otherwise.
+    """
+    if role is None:
+        return "text"
+    if role not in SEARCH_ROLES:
+        raise ValueError(f"Unknown role {role!r}. Expected one of {SEARCH_ROLES} or None.")
+    return f"text_{role}"
+
+
+def message_text(conversation, role=None):
+    """
+    Derives the search text of conversations: the lowercased message contents joined with newlines,
+    without role keys or struct punctuation.
+
+    Parameters:
+    - conversation (pyarrow.Array or pyarrow.ChunkedArray): list<struct<content, role>> column.
+    - role (str): Only include messages with this role ('user' or 'assistant'). All messages if None.
+
+    Returns:
+    - pyarrow.Array or pyarrow.ChunkedArray: One string per conversation (empty for null conversations).
+    """
+    if isinstance(conversation, pa.ChunkedArray):
+        return pa.chunked_array([message_text(chunk, role=role) for chunk in conversation.chunks], type=pa.string())
+    content = pc.fill_null(conversation.values.field("content"), "")
+    if role is not None:
+        content = pc.if_else(pc.equal(conversation.values.field("role"), role), content, "")
+    messages = pa.ListArray.from_arrays(conversation.offsets, content, mask=conversation.is_null())
+    return pc.fill_null(pc.utf8_lower(pc.binary_join(messages, "\n")), "")
+
+
+def message_preview(conversation, position, width=100):
+    """
+    Returns the first `width` characters of the message at `position` of each conversation, or null for
+    conversations with fewer messages.
+
+    Parameters:
+    - conversation (pyarrow.Array or pyarrow.ChunkedArray): list<struct<content, role>> column.
+    - position (int): Message position (0 for the first prompt, 1 for the first response).
+    - width (int): Maximum preview length in characters.
+
+    Returns:
+    - pyarrow.Array or pyarrow.ChunkedArray: One string per conversation.
+    """
+    if isinstance(conversation, pa.ChunkedArray):
+        return pa.chunked_array([message_preview(chunk, position, width) for chunk in conversation.chunks], type=pa.string())
+    present = np.asarray(pc.fill_null(pc.greater(pc.list_value_length(conversation), position), False))
+    indices = pa.array(np.asarray(conversation.offsets)[:-1] + position, mask=~present)
+    content = conversation.values.field("content").take(indices)
+    return pc.utf8_slice_codeunits(content, 0, width)
+
+
+def first_message_length(conversation, role="user"):
+    """
+    Returns the length in characters of the first message with the given role in each conversation,
+    or null for conversations without such a message.
+    """
+    if isinstance(conversation, pa.ChunkedArray):
+        return pa.chunked_array([first_message_length(chunk, role) for chunk in conversation.chunks], type=pa.int32())
+    values = conversation.values
+    lengths = np.full(len(conversation), -1, dtype=np.int64)
+    if len(values) > 0:
+        offsets = np.asarray(conversation.offsets)
+        # Position of each message in the values array, and the conversation it belongs to
+        in_range = np.arange(len(values))
+        in_range = in_range[(in_range >= offsets[0]) & (in_range < offsets[-1])]
+        parents = np.searchsorted(offsets, in_range, side="right") - 1
+        matches = np.asarray(pc.fill_null(pc.equal(values.field("role"), role), False))[in_range]
+        first_parents, first = np.unique(parents[matches], return_index=True)
+        message_lengths = np.asarray(pc.fill_null(pc.utf8_length(values.field("content")), 0))[in_range]
+        lengths[first_parents] = message_lengths[matches][first]
+    return pa.array(lengths, type=pa.int32(), mask=lengths < 0)
+
+
+# Columns of the conversation body, fetched on demand when result sets hold listings only
+BODY_COLUMNS = ["conversation", "openai_moderation"]
+
+# Display columns derived once per result set by with_display_columns
+DISPLAY_COLUMNS = ["prompt_preview", "response_preview", "prompt_length", "n_messages"]
+
+
+def with_display_columns(table, preview_chars=100):
+    """
+    Appends the display fields of each conversation, computed with Arrow kernels:
+    prompt_preview and response_preview (first `preview_chars` characters of the first two messages, null
+    if missing), prompt_length (characters of the first user message) and n_messages.
+    Tables without a conversation column, or that already have the fields, are returned unchanged.
+    """
+    if "conversation" not in table.column_names or "prompt_preview" in table.column_names:
+        return table
+    conversation = table.column("conversation")
+    table = table.append_column("prompt_preview", message_preview(conversation, 0, preview_chars))
+    table = table.append_column("response_preview", message_preview(conversation, 1, preview_chars))
+    table = table.append_column("prompt_length", first_message_length(conversation, role="user"))
+    return table.append_column("n_messages", pc.cast(pc.fill_null(pc.list_value_length(conversation), 0), pa.int32()))
+
+
+def listing_table(table, preview_chars=100):
+    """
+    Converts a table of full conversations to a listing: the metadata columns plus the display columns
+    (see with_display_columns), without the conversation bodies (BODY_COLUMNS).
+    """
+    table = with_display_columns(table, preview_chars)
+    return table.drop_columns([name for name in BODY_COLUMNS if name in table.column_names])
+
+
+def normalize_query(filter_str):
+    """
+    Lowercases a search string the same way message_text lowercases the searched text.
+    """
+    return pc.utf8_lower(pa.scalar(filter_str, type=pa.string())).as_py()
+
+
+def build_search_file(parquet_path, output_path, role_columns=False, row_group_size=8192, batch_size=8192):
+    """
+    Writes the derived search layout of a shard: its row number plus the precomputed search text,
+    in small zstd-compressed row groups. Searches then scan just this column and join back to the
+    shard by row.
+
+    Parameters:
+    - parquet_path (str): Local path of the source shard.
+    - output_path (str): Path of the derived parquet file.
+    - role_columns (bool): Also write user-only (text_user) and assistant-only (text_assistant) columns.
+    - row_group_size (int): Rows per row group of the derived file.
+    - batch_size (int): Rows read from the source shard at a time. Bounds memory use.
+    """
+    fields = [("row", pa.uint32()), ("text", pa.string())]
+    if role_columns:
+        fields += [(search_column(role), pa.string()) for role in SEARCH_ROLES]
+    schema = pa.schema(fields, metadata={"search_text_version": SEARCH_TEXT_VERSION})
+    # Unique temporary file, so concurrent builds of the same file do not write over each other
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(output_path)}.", suffix=".tmp",
+                                    dir=os.path.dirname(output_path) or ".")
+    os.close(fd)
+    try:
+        first_row = 0
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            for batch in pq.ParquetFile(parquet_path).iter_batches(batch_size=batch_size, columns=["conversation"]):
+                conversation = batch.column(0)
+                columns = [pa.array(range(first_row, first_row + batch.num_rows), type=pa.uint32()),
+                           message_text(conversation)]
+                if role_columns:
+                    columns += [message_text(conversation, role=role) for role in SEARCH_ROLES]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema), row_group_size=row_group_size)
+                first_row += batch.num_rows
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return output_path
+
+
+def search_rows(search_path, query, column="text", con=None):
+    """
+    Returns the rows (within the source shard) whose search text contains the normalized query.
+    Only the row and text columns of the derived file are read.
+    """
+    close = con is None
+    con = con or duckdb.connect()
+    try:
+        result = con.execute(
+            f"SELECT row FROM read_parquet('{search_path}') WHERE contains({column}, ?) ORDER BY row", [query]
+        ).fetchnumpy()
+        return result["row"]
+    finally:
+        if close:
+            con.close()
+
+
+class SearchColumnStore:
+    def __init__(self, store_dir="cache/search", role_columns=False):
+        """
+        Directory of derived search files, one per shard version (file name plus ETag). When a shard's
+        file is built, the files of its other versions (older ETags, search text versions or column sets)
+        are deleted, so the directory holds one derived file per shard.
+
+        Parameters:
+        - store_dir (str): Directory for the derived files.
+        - role_columns (bool): Build user-only and assistant-only text columns as well.
+        """
+        self.store_dir = store_dir
+        self.role_columns = role_columns
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        os.makedirs(store_dir, exist_ok=True)
+
+    @staticmethod
+    def _stem(file_name):
+        return file_name[:-len(".parquet")] if file_name.endswith(".parquet") else file_name
+
+    def path_for(self, file_name, etag=None):
+        version = f"{(etag or '').strip(chr(34))}|{SEARCH_TEXT_VERSION}"
+        if self.role_columns:
+            version += "|roles"
+        digest = hashlib.sha1(version.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.store_dir, f"{self._stem(file_name)}.{digest}.search.parquet")
+
+    def has_column(self, column):
+        """
+        Tells whether the files of this store have the given search column (see search_column).
+        """
+        return column == "text" or self.role_columns
+
+    def remove_stale(self, file_name, keep):
+        """
+        Deletes the derived files of other versions of a shard than the one at keep.
+        """
+        pattern = re.compile(rf"{re.escape(self._stem(file_name))}\.[0-9a-f]{{16}}\.search\.parquet")
+        for name in os.listdir(self.store_dir):
+            path = os.path.join(self.store_dir, name)
+            if pattern.fullmatch(name) and path != keep:
+                try:
+                    os.unlink(path)
+                    print(f"Removed stale search file {name}")
+                except FileNotFoundError:
+                    pass
+
+    def get(self, file_name, etag=None):
+        """
+        Returns the path of the derived search file for a shard version, or None if it was not built.
+        """
+        path = self.path_for(file_name, etag)
+        return path if os.path.exists(path) else None
+
+    def build(self, file_name, parquet_path, etag=None):
+        """
+        Builds the derived search file for a local shard, unless it already exists, and returns its path.
+        Concurrent builds of the same shard version in this process wait for the first one and reuse its file.
+        """
+        path = self.path_for(file_name, etag)
+        with self._lock:
+            build_lock = self._build_locks.setdefault(path, threading.Lock())
+        with build_lock:
+            if os.path.exists(path):
+                return path
+            build_search_file(parquet_path, path, role_columns=self.role_columns)
+        self.remove_stale(file_name, keep=path)
+        return path
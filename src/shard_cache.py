@@ -0,0 +1,127 @@
+import os
+import hashlib
+import tempfile
+import threading
+
+
+class ShardCache:
+    def __init__(self, cache_dir="cache/shards", max_bytes=8 * 1024**3, verbose=True):
+        """
+        Content-addressed on-disk cache for parquet shards with LRU eviction.
+
+        Entries are keyed by shard file name plus ETag, so a shard that changes upstream gets a new
+        entry and the stale one ages out. Recency is tracked with file modification times, which
+        keeps the cache state on disk and lets several processes share the same directory.
+
+        Parameters:
+        - cache_dir (str): Directory where cached shards are stored.
+        - max_bytes (int): Byte budget. Least recently used shards are evicted once it is exceeded.
+        - verbose (bool): Print cache hits, misses and evictions.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.verbose = verbose
+        self._lock = threading.RLock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def entry_name(file_name, etag=None):
+        """
+        Returns the cache file name for a shard: '<stem>.<etag digest>.parquet'.
+        """
+        stem = file_name[:-len(".parquet")] if file_name.endswith(".parquet") else file_name
+        digest = hashlib.sha1((etag or "").strip('"').encode("utf-8")).hexdigest()[:16]
+        return f"{stem}.{digest}.parquet"
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".parquet"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def get(self, file_name, etag=None):
+        """
+        Returns the local path of a cached shard, or None on a miss. A hit refreshes its LRU position.
+
+        If etag is None, the most recently used entry for file_name is returned regardless of its ETag,
+        which is what callers want when the origin cannot be reached.
+        """
+        with self._lock:
+            if etag is not None:
+                path = os.path.join(self.cache_dir, self.entry_name(file_name, etag))
+                if not os.path.exists(path):
+                    return None
+            else:
+                stem = self.entry_name(file_name).rsplit(".", 2)[0]
+                candidates = [e for e in self._entries() if os.path.basename(e[2]).rsplit(".", 2)[0] == stem]
+                if not candidates:
+                    return None
+                path = max(candidates)[2]
+            os.utime(path, None)
+            if self.verbose:
+                print(f"Shard cache hit: {file_name}")
+            return path
+
+    def reserve(self, file_name):
+        """
+        Returns a temporary path inside the cache directory to download a shard into.
+        Pass it to put() once the download is complete.
+        """
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{file_name}.", suffix=".part", dir=self.cache_dir)
+        os.close(fd)
+        return tmp_path
+
+    def put(self, file_name, etag, src_path):
+        """
+        Moves a downloaded shard into the cache and evicts least recently used entries beyond the budget.
+
+        Returns:
+        - str: Path of the cached shard.
+        """
+        with self._lock:
+            path = os.path.join(self.cache_dir, self.entry_name(file_name, etag))
+            os.replace(src_path, path)
+            os.utime(path, None)
+            self.evict(keep=path)
+            return path
+
+    def evict(self, keep=None):
+        """
+        Deletes least recently used shards until the cache fits in max_bytes. The entry at `keep` is never evicted.
+        """
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.unlink(path)
+                    total -= size
+                    if self.verbose:
+                        print(f"Evicted {os.path.basename(path)} from shard cache ({size} bytes)")
+                except FileNotFoundError:
+                    pass
+
+    def size(self):
+        """
+        Returns the total number of bytes held in the cache.
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
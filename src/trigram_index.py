@@ -0,0 +1,172 @@
+import os
+import json
+import zlib
+import shutil
+import numpy as np
+import pyarrow.parquet as pq
+from search_columns import SEARCH_TEXT_VERSION, message_text
+
+
+class TrigramIndex:
+    def __init__(self, index_dir="index/trigrams"):
+        """
+        On-disk trigram inverted index over conversation text, used to answer literal searches
+        without scanning every shard.
+
+        Each shard has its own subdirectory with one or more segments. A segment covers a block of rows
+        and stores its sorted trigram codes and posting offsets as memory-mapped .npy arrays, plus a
+        postings file where each trigram's row list is delta-encoded and zlib-compressed on its own.
+        A search decompresses only the posting lists of the query's trigrams and intersects them,
+        so the shard is only read for the candidate rows, which still have to be verified.
+
+        The indexed text is the same as the one literal_text_search matches against: the lowercased
+        message contents produced by search_columns.message_text.
+
+        Parameters:
+        - index_dir (str): Directory holding the per-shard indexes.
+        """
+        self.index_dir = index_dir
+        self.shards = {}
+        if os.path.isdir(index_dir):
+            for name in sorted(os.listdir(index_dir)):
+                meta_path = os.path.join(index_dir, name, "meta.json")
+                if os.path.exists(meta_path):
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+                    self.shards[meta["file_name"]] = meta
+        self._segments = {}
+
+    @staticmethod
+    def trigrams(text):
+        """
+        Returns the sorted, unique trigram codes of a string. Each code packs three 21-bit code points.
+        """
+        if text is None or len(text) < 3:
+            return np.zeros(0, dtype=np.uint64)
+        code_points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        return np.unique((code_points[:-2] << np.uint64(42)) | (code_points[1:-1] << np.uint64(21)) | code_points[2:])
+
+    def covers(self, file_name, etag=None):
+        """
+        True if the shard is indexed and, when etag is given, the index was built from that version of it.
+        """
+        meta = self.shards.get(file_name)
+        if meta is None or meta.get("text_version") != SEARCH_TEXT_VERSION:
+            return False
+        return etag is None or meta.get("etag") == etag
+
+    def _load_segment(self, file_name, segment):
+        key = (file_name, segment["name"])
+        if key not in self._segments:
+            shard_dir = os.path.join(self.index_dir, self.shards[file_name]["dir"])
+            keys = np.load(os.path.join(shard_dir, f"{segment['name']}.keys.npy"), mmap_mode="r")
+            offsets = np.load(os.path.join(shard_dir, f"{segment['name']}.offsets.npy"), mmap_mode="r")
+            postings_path = os.path.join(shard_dir, f"{segment['name']}.postings.bin")
+            if os.path.getsize(postings_path) > 0:
+                postings = np.memmap(postings_path, dtype=np.uint8, mode="r")
+            else:
+                postings = np.zeros(0, dtype=np.uint8)
+            self._segments[key] = (keys, offsets, postings)
+        return self._segments[key]
+
+    @staticmethod
+    def _read_posting(keys, offsets, postings, code):
+        position = np.searchsorted(keys, code)
+        if position >= len(keys) or keys[position] != code:
+            return np.zeros(0, dtype=np.uint32)
+        data = zlib.decompress(postings[int(offsets[position]):int(offsets[position + 1])].tobytes())
+        return np.cumsum(np.frombuffer(data, dtype=np.uint32), dtype=np.uint32)
+
+    def candidate_rows(self, file_name, query):
+        """
+        Returns the rows of a shard that contain every trigram of the (already lowercased) query.
+        They are candidates: the literal match still has to be verified.
+
+        Returns:
+        - numpy.ndarray: Sorted row numbers within the shard, or None if the query is shorter than
+          three characters and the index cannot narrow it down.
+        """
+        codes = self.trigrams(query)
+        if len(codes) == 0:
+            return None
+        rows = []
+        for segment in self.shards[file_name]["segments"]:
+            keys, offsets, postings = self._load_segment(file_name, segment)
+            postings_lists = [self._read_posting(keys, offsets, postings, code) for code in codes]
+            postings_lists.sort(key=len)
+            candidates = postings_lists[0]
+            for posting in postings_lists[1:]:
+                if len(candidates) == 0:
+                    break
+                candidates = np.intersect1d(candidates, posting, assume_unique=True)
+            rows.append(candidates)
+        return np.concatenate(rows) if rows else np.zeros(0, dtype=np.uint32)
+
+    @staticmethod
+    def _write_segment(shard_dir, name, texts, first_row):
+        codes, rows = [], []
+        for i, text in enumerate(texts):
+            text_codes = TrigramIndex.trigrams(text)
+            codes.append(text_codes)
+            rows.append(np.full(len(text_codes), first_row + i, dtype=np.uint32))
+        codes = np.concatenate(codes) if codes else np.zeros(0, dtype=np.uint64)
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.uint32)
+        # Stable sort keeps rows ascending within each trigram
+        order = np.argsort(codes, kind="stable")
+        codes, rows = codes[order], rows[order]
+        keys, starts = np.unique(codes, return_index=True)
+        deltas = rows.copy()
+        deltas[1:] -= rows[:-1]
+        deltas[starts] = rows[starts]
+        ends = np.append(starts[1:], len(rows))
+
+        offsets = np.zeros(len(keys) + 1, dtype=np.uint64)
+        with open(os.path.join(shard_dir, f"{name}.postings.bin"), "wb") as f:
+            for i, (start, end) in enumerate(zip(starts, ends)):
+                block = zlib.compress(deltas[start:end].tobytes(), 6)
+                f.write(block)
+                offsets[i + 1] = offsets[i] + len(block)
+        np.save(os.path.join(shard_dir, f"{name}.keys.npy"), keys)
+        np.save(os.path.join(shard_dir, f"{name}.offsets.npy"), offsets)
+        return {"name": name, "first_row": first_row, "num_rows": len(texts), "num_trigrams": len(keys)}
+
+    @classmethod
+    def build_shard(cls, index_dir, file_name, parquet_path, etag=None, segment_rows=10000):
+        """
+        Indexes one local parquet shard, replacing any previous index for it.
+
+        Parameters:
+        - index_dir (str): Root directory of the trigram index.
+        - file_name (str): Shard file name, used to match the index to the dataset's parquet URLs.
+        - parquet_path (str): Local path of the shard.
+        - etag (str): ETag of the shard version being indexed. Stale indexes are ignored at search time.
+        - segment_rows (int): Rows per segment. Bounds the memory used while building.
+
+        Returns:
+        - dict: The shard's index metadata.
+        """
+        shard_dir_name = file_name[:-len(".parquet")] if file_name.endswith(".parquet") else file_name
+        shard_dir = os.path.join(index_dir, shard_dir_name)
+        tmp_dir = f"{shard_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        segments, texts, first_row = [], [], 0
+        for batch in pq.ParquetFile(parquet_path).iter_batches(batch_size=segment_rows, columns=["conversation"]):
+            texts.extend(message_text(batch.column(0)).to_pylist())
+            while len(texts) >= segment_rows:
+                segments.append(cls._write_segment(tmp_dir, f"segment-{len(segments):04d}",
+                                                   texts[:segment_rows], first_row))
+                first_row += segment_rows
+                texts = texts[segment_rows:]
+        if texts:
+            segments.append(cls._write_segment(tmp_dir, f"segment-{len(segments):04d}", texts, first_row))
+            first_row += len(texts)
+
+        meta = {"file_name": file_name, "dir": shard_dir_name, "etag": etag, "text_version": SEARCH_TEXT_VERSION,
+                "num_rows": first_row, "segments": segments}
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        os.replace(tmp_dir, shard_dir)
+        return meta
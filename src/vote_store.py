@@ -0,0 +1,245 @@
+import os
+import json
+import math
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class VoteStore:
+    def __init__(self, db_path="db/votes.sqlite", legacy_json_path="json/votes_log.json",
+                 batch_size=100, flush_interval=1.0):
+        """
+        Append-only store of conversation votes in a SQLite database in WAL mode.
+
+        record() only puts the vote on a queue and returns; a background writer thread inserts queued votes
+        in batches, one transaction per batch, at most flush_interval seconds after they were recorded.
+        WAL mode lets readers and writers from other processes work concurrently, and every vote is an
+        INSERT, so concurrent sessions cannot overwrite each other's votes. Pending votes are flushed at
+        interpreter exit.
+
+        The votes of the former json/votes_log.json file are imported once (the import is recorded in the
+        migrations table). The JSON file is left in place.
+
+        Parameters:
+        - db_path (str): Path of the SQLite database.
+        - legacy_json_path (str): JSON vote log to import ({"votes": [...]}). None to skip the migration.
+        - batch_size (int): Maximum number of votes written per transaction.
+        - flush_interval (float): Maximum seconds a vote waits in the queue.
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS votes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id TEXT NOT NULL,
+                    model TEXT,
+                    vote TEXT NOT NULL CHECK (vote IN ('upvote', 'downvote')),
+                    timestamp TEXT NOT NULL
+                )
+            """)
+            con.execute("CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, applied_at TEXT)")
+            # Aggregates maintained on every write, so scores and leaderboards never scan the votes table
+            for table, key in (("conversation_scores", "conversation_id"), ("model_scores", "model")):
+                con.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        {key} TEXT PRIMARY KEY,
+                        {"model TEXT," if table == "conversation_scores" else ""}
+                        upvotes INTEGER NOT NULL DEFAULT 0,
+                        downvotes INTEGER NOT NULL DEFAULT 0,
+                        wilson REAL NOT NULL DEFAULT 0
+                    )
+                """)
+                con.execute(f"CREATE INDEX IF NOT EXISTS {table}_wilson_idx ON {table} (wilson DESC)")
+            con.execute("CREATE INDEX IF NOT EXISTS conversation_scores_net_idx ON conversation_scores ((upvotes - downvotes) DESC)")
+        self._backfill_aggregates()
+        if legacy_json_path:
+            self._migrate_json(legacy_json_path)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="vote-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    @contextmanager
+    def _connect(self, write=False):
+        # Autocommit connection; write=True wraps the block in an immediate (write-locked) transaction
+        con = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            if write:
+                con.execute("BEGIN IMMEDIATE")
+            yield con
+            if write:
+                con.execute("COMMIT")
+        except BaseException:
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    @staticmethod
+    def wilson_score(upvotes, downvotes, z=1.96):
+        """
+        Lower bound of the Wilson score interval for the share of upvotes (95% confidence by default).
+        Ranks items with few votes below items with many votes and a similar share of upvotes.
+        """
+        n = upvotes + downvotes
+        if n == 0:
+            return 0.0
+        p = upvotes / n
+        return (p + z * z / (2 * n) - z * math.sqrt((p * (1 - p) + z * z / (4 * n)) / n)) / (1 + z * z / n)
+
+    def _apply_votes(self, con, batch):
+        # Inserts votes and updates the aggregates of the conversations and models they touch
+        con.executemany("INSERT INTO votes (conversation_id, model, vote, timestamp) VALUES (?, ?, ?, ?)", batch)
+        deltas = {}
+        for conversation_id, model, vote, _ in batch:
+            for table, key in (("conversation_scores", conversation_id), ("model_scores", model)):
+                if key is None:
+                    continue
+                up, down = deltas.get((table, key), (0, 0))
+                deltas[(table, key)] = (up + (vote == "upvote"), down + (vote == "downvote"))
+        models = {conversation_id: model for conversation_id, model, _, _ in batch}
+        for (table, key), (up, down) in deltas.items():
+            key_column = "conversation_id" if table == "conversation_scores" else "model"
+            upvotes, downvotes = con.execute(f"SELECT upvotes, downvotes FROM {table} WHERE {key_column} = ?",
+                                             [key]).fetchone() or (0, 0)
+            upvotes, downvotes = upvotes + up, downvotes + down
+            if table == "conversation_scores":
+                con.execute("INSERT OR REPLACE INTO conversation_scores VALUES (?, ?, ?, ?, ?)",
+                            [key, models[key], upvotes, downvotes, self.wilson_score(upvotes, downvotes)])
+            else:
+                con.execute("INSERT OR REPLACE INTO model_scores VALUES (?, ?, ?, ?)",
+                            [key, upvotes, downvotes, self.wilson_score(upvotes, downvotes)])
+
+    def _backfill_aggregates(self):
+        # One-off computation of the aggregates for votes recorded before they were maintained
+        with self._connect(write=True) as con:
+            if con.execute("SELECT count(*) FROM migrations WHERE name = 'aggregates'").fetchone()[0] > 0:
+                return
+            rows = con.execute("""
+                SELECT conversation_id, max(model), sum(vote = 'upvote'), sum(vote = 'downvote')
+                FROM votes GROUP BY conversation_id
+            """).fetchall()
+            con.executemany("INSERT OR REPLACE INTO conversation_scores VALUES (?, ?, ?, ?, ?)",
+                            [(c, m, up, down, self.wilson_score(up, down)) for c, m, up, down in rows])
+            rows = con.execute("""
+                SELECT model, sum(vote = 'upvote'), sum(vote = 'downvote') FROM votes
+                WHERE model IS NOT NULL GROUP BY model
+            """).fetchall()
+            con.executemany("INSERT OR REPLACE INTO model_scores VALUES (?, ?, ?, ?)",
+                            [(m, up, down, self.wilson_score(up, down)) for m, up, down in rows])
+            con.execute("INSERT INTO migrations VALUES ('aggregates', ?)", [datetime.now().isoformat()])
+
+    def _migrate_json(self, json_path):
+        name = f"json:{os.path.abspath(json_path)}"
+        with self._connect(write=True) as con:
+            if con.execute("SELECT count(*) FROM migrations WHERE name = ?", [name]).fetchone()[0] > 0:
+                return
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    votes = json.load(f).get("votes", [])
+            except FileNotFoundError:
+                votes = []
+            except json.JSONDecodeError as e:
+                print(f"Could not migrate {json_path}: {e}")
+                return
+            self._apply_votes(con, [(v["conversation_id"], v.get("model"), v["vote"], v["timestamp"]) for v in votes])
+            con.execute("INSERT INTO migrations VALUES (?, ?)", [name, datetime.now().isoformat()])
+        if votes:
+            print(f"Imported {len(votes)} votes from {json_path}")
+
+    def record(self, conversation_id, model, vote, timestamp=None):
+        """
+        Queues a vote for writing and returns immediately.
+
+        Parameters:
+        - conversation_id (str): ID of the voted conversation.
+        - model (str): Model of the conversation.
+        - vote (str): 'upvote' or 'downvote'.
+        - timestamp (str): ISO timestamp. Defaults to now.
+        """
+        if vote not in ("upvote", "downvote"):
+            raise ValueError(f"Invalid vote: {vote}")
+        self._queue.put((conversation_id, model, vote, timestamp or datetime.now().isoformat()))
+
+    def _write(self, batch):
+        with self._connect(write=True) as con:
+            self._apply_votes(con, batch)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except sqlite3.Error as e:
+                print(f"Could not write {len(batch)} vote(s): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """
+        Blocks until every queued vote has been written.
+        """
+        self._queue.join()
+
+    def votes(self):
+        """
+        Returns all votes as a list of dicts, oldest first, in the format of the former JSON log.
+        """
+        with self._connect() as con:
+            rows = con.execute("SELECT conversation_id, model, vote, timestamp FROM votes ORDER BY id").fetchall()
+        return [{"conversation_id": c, "model": m, "vote": v, "timestamp": t} for c, m, v, t in rows]
+
+    def __len__(self):
+        with self._connect() as con:
+            return con.execute("SELECT count(*) FROM votes").fetchone()[0]
+
+    def conversation_score(self, conversation_id):
+        """
+        Returns the votes of a conversation as a dict with upvotes, downvotes, net and wilson (zeros if never voted).
+        """
+        with self._connect() as con:
+            row = con.execute("SELECT upvotes, downvotes, wilson FROM conversation_scores WHERE conversation_id = ?",
+                              [conversation_id]).fetchone()
+        upvotes, downvotes, wilson = row or (0, 0, 0.0)
+        return {"upvotes": upvotes, "downvotes": downvotes, "net": upvotes - downvotes, "wilson": wilson}
+
+    def top_conversations(self, limit=10, order_by="wilson"):
+        """
+        Returns the best voted conversations, as a list of dicts, ranked by Wilson score ('wilson') or
+        by net score ('net'). Both orders are served by an index.
+        """
+        order = {"wilson": "wilson DESC", "net": "(upvotes - downvotes) DESC"}[order_by]
+        with self._connect() as con:
+            rows = con.execute(f"""
+                SELECT conversation_id, model, upvotes, downvotes, upvotes - downvotes, wilson
+                FROM conversation_scores ORDER BY {order} LIMIT ?
+            """, [int(limit)]).fetchall()
+        return [dict(zip(("conversation_id", "model", "upvotes", "downvotes", "net", "wilson"), row)) for row in rows]
+
+    def model_leaderboard(self, limit=None):
+        """
+        Returns per-model upvote and downvote counts, as a list of dicts ranked by Wilson score.
+        """
+        with self._connect() as con:
+            rows = con.execute(f"""
+                SELECT model, upvotes, downvotes, wilson FROM model_scores ORDER BY wilson DESC
+                {f"LIMIT {int(limit)}" if limit else ""}
+            """).fetchall()
+        return [dict(zip(("model", "upvotes", "downvotes", "wilson"), row)) for row in rows]
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from remote_parquet import read_rows
+from result_schema import compact_results
+
+
+class WarmCache:
+    def __init__(self, path="cache/warm_chats.parquet", row_group_size=25):
+        """
+        Parquet file of pre-sampled conversations that new sessions start from.
+
+        The file is written in small row groups, and sample() reads only the parquet footer and a few
+        randomly chosen row groups, so a session starts by reading kilobytes whatever the size of the
+        file. Unlike the sample pool, the warm cache is not consumed: every session draws its own sample
+        from it. The file is rewritten by DatasetWrapper.refresh_warm_cache.
+
+        Parameters:
+        - path (str): Parquet file holding the warm cache.
+        - row_group_size (int): Rows per row group when the file is written.
+        """
+        self.path = path
+        self.row_group_size = row_group_size
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def sample(self, n_samples, seed=None):
+        """
+        Returns up to n_samples random conversations from the warm cache, in random order, or None if the
+        warm cache is missing or unreadable. Rows are drawn from a random subset of the row groups, one more
+        than strictly needed so that sessions do not all get the contents of a single row group.
+        """
+        try:
+            parquet_file = pq.ParquetFile(self.path)
+        except (FileNotFoundError, pa.ArrowException, OSError):
+            return None
+        metadata = parquet_file.metadata
+        if metadata.num_rows == 0 or n_samples <= 0:
+            return None
+        rng = np.random.default_rng(seed)
+        row_group_sizes = np.array([metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)], dtype=np.int64)
+        row_group_starts = np.concatenate([[0], np.cumsum(row_group_sizes)[:-1]])
+        n_row_groups = min(int(np.ceil(n_samples / max(row_group_sizes.mean(), 1))) + 1, metadata.num_row_groups)
+        row_groups = rng.choice(metadata.num_row_groups, size=n_row_groups, replace=False)
+        candidates = np.concatenate([np.arange(row_group_starts[i], row_group_starts[i] + row_group_sizes[i])
+                                     for i in row_groups])
+        rows = rng.choice(candidates, size=min(n_samples, len(candidates)), replace=False)
+        return read_rows(parquet_file, rows)
+
+    def write(self, table):
+        """
+        Replaces the warm cache with the given conversations (pyarrow Table). Rows should already be in
+        random order, since sample() draws whole row groups.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(self.path)}.", suffix=".tmp",
+                                        dir=os.path.dirname(self.path) or ".")
+        os.close(fd)
+        pq.write_table(compact_results(table), tmp_path, row_group_size=self.row_group_size)
+        os.replace(tmp_path, self.path)
+        print(f"Wrote {table.num_rows} conversations to {self.path} ({os.path.getsize(self.path)} bytes)")